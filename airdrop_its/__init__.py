@@ -0,0 +1,35 @@
+import importlib
+
+# Command line entry points (python -m airdrop_its <command>) and their descriptions
+COMMANDS = {
+    'analysis': 'Interrupted time series analysis of airdrop effects',
+    'posterior': 'Durbin-Watson autocorrelation check of the ITS models',
+    'robustness': 'Robustness check on the 15 days before each airdrop',
+    'pipeline': 'Main ITS fit, autocorrelation check and robustness check in one pass over the data',
+    'ingest': 'Compile the protocol and covariate CSVs into a memory-mapped columnar store',
+    'fetch': 'Fetch the days missing from the covariate (and protocol) CSVs concurrently',
+    'placebo': 'Placebo (randomization inference) test of the airdrop effects',
+    'sensitivity': 'Refit the ITS model for every pre/post window length around the airdrop',
+    'streaming': 'Update the ITS fits with the rows appended since the last run',
+    'events': 'ITS models with one level and slope change per airdrop from an event calendar',
+    'panel': 'Pooled panel ITS model with protocol fixed effects per protocol type',
+    'shrinkage': 'Partially pool the per-protocol airdrop effects towards the protocol type mean',
+    'breakpoints': 'Search every candidate break date for the regime shift of each protocol (sup-F / Chow scan)',
+    'history': 'Query the run history of the result files',
+    'benchmark': 'Benchmark prepare_data, fit_model and the result writing on synthetic protocol folders'
+}
+
+MODULES = list(COMMANDS) + ['batch_ols', 'bootstrap', 'columnar', 'compact', 'covariates', 'metrics', 'parallel',
+                            'result_cache', 'suffstats']
+
+
+def __getattr__(name):
+    # Submodules are imported on first access, so importing the package itself does not
+    # load pandas or SciPy
+    if name in MODULES:
+        return importlib.import_module(f'.{name}', __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + MODULES)
@@ -0,0 +1,29 @@
+import importlib
+import sys
+from . import COMMANDS
+
+
+def usage():
+    lines = ['usage: python -m airdrop_its <command> [options]', '', 'commands:']
+    lines += [f'  {command:<12} {description}' for command, description in COMMANDS.items()]
+    lines += ['', "Run 'python -m airdrop_its <command> --help' for the options of a command."]
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ('-h', '--help'):
+        print(usage())
+        return
+    command, args = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(usage(), file=sys.stderr)
+        sys.exit(f"\nunknown command '{command}'")
+
+    # Only the chosen command's module (and what it needs) is imported
+    sys.argv[0] = f'python -m airdrop_its {command}'
+    importlib.import_module(f'.{command}', __package__).main(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+import pandas as pd
+import numpy as np
+import os
+import argparse
+from datetime import datetime, timedelta
+from .batch_ols import COV_TYPES, WindowProjections, fit_ols_stack, het_breuschpagan_batch
+from .covariates import CovariateStore
+from .columnar import ColumnarStore, read_protocol
+from .compact import CompactFrames, records_frame, result_records
+from .parallel import map_protocol_chunks
+from .result_cache import add_cache_arguments, cache_from_args, result_spec, run_cached
+from .history import add_history_arguments, history_from_args
+from .bootstrap import BOOTSTRAP_METHODS, bootstrap_intervals
+from .metrics import add_metrics_arguments, count, quiet, set_quiet, timer, write_metrics
+
+# Identifies the model in the result cache; change it whenever the estimation changes
+MODEL_SPEC = 'analysis|OLS, Breusch-Pagan|const,T,X,X_T,t,t_X,MCt,Close|61 days'
+COVARIATE_COLUMNS = ['MCt', 'Close']
+
+# Fields of the result records and their columns in the result files
+RESULT_COLUMNS = {
+    'const': 'α0 or β0 or γ0 (Intercept)',
+    'T': 'α1 or β1 or γ1 (T)',
+    'X': 'α2 or β2 or γ2 (X)',
+    'X_T': 'α3 or β3 or γ3 (X*T)',
+    't': 'α4 or β4 or γ4 (t)',
+    't_X': 'α5 or β5 or γ5 (t*X)',
+    'MCt': 'δ (MCt)',
+    'Close': 'S&P 500',
+    'p_X': 'p_value (X)',
+    'p_X_T': 'p_value (X*T)',
+    'p_MCt': 'p_value (MCt)',
+    'p_Close': 'p_value (S&P 500)'
+}
+BOOTSTRAP_LABELS = {'X': 'X', 'X_T': 'X*T', 'MCt': 'MCt', 'Close': 'S&P 500'}
+
+def build_frame(df, covariates):
+    # ITS columns and covariates for one protocol frame as read from disk
+    df = df.sort_values('Date')
+
+    airdrop_date = df.iloc[30]['Date']
+
+    df['T'] = range(-30, 31)
+    df['X'] = np.where(df.index < 30, 0, 1)
+    df['X_T'] = df['X'] * df['T']
+    df['t'] = range(1, 62)
+    df['t_X'] = df['t'] * df['X']
+
+    # Align market cap and S&P 500 data from the shared covariate calendar
+    df = df.reset_index(drop=True)
+    for column, values in covariates.window(df['Date'], ['MCt', 'Close']).items():
+        df[column] = values
+
+    return df, airdrop_date
+
+def prepare_data(file_path, metric_name, covariates, store=None):
+    df, airdrop_date = build_frame(read_protocol(file_path, store), covariates)
+
+    if not quiet():
+        print(f"Protocol: {file_path}")
+        print(f"Date range: {df['Date'].min()} to {df['Date'].max()}")
+        print(f"Airdrop date: {airdrop_date}")
+        print(f"Market cap data available: {df['MCt'].notna().sum()} / {len(df)} days")
+        print(f"S&P 500 data available: {df['Close'].notna().sum()} / {len(df)} days")
+        print("First few rows of merged data:")
+        print(df.head())
+        print("\n")
+
+    return df, airdrop_date
+
+def new_frames(float32=False, nobs=61, airdrop_index=30):
+    # Compact store for the 61-day window with the airdrop at row 30, or another window shape
+    return CompactFrames(['T', 'X', 'X_T', 't', 't_X'], COVARIATE_COLUMNS, nobs, airdrop_index, float32)
+
+def fit_model(X, y, exog_names, cov_type='nonrobust', maxlags=None, projections=None):
+    # Fit a chunk of protocols in one batched OLS solve
+    with timer('fit'):
+        results = fit_ols_stack(X, y, exog_names, projections)
+    count('protocols_fitted', len(y), model='analysis')
+
+    # Test for heteroskedasticity
+    with timer('diagnostics'):
+        _, p_values = het_breuschpagan_batch(results)
+
+    # GLS(y, X, weights=...) ignored the weights keyword and reproduced the OLS fit,
+    # so the batched OLS results are used for both branches. With a robust covariance
+    # type the heteroskedastic protocols get sandwich standard errors from the same solve.
+    count('gls_fallbacks', int((p_values < 0.05).sum()))
+    results.apply_robust_cov(cov_type, maxlags, mask=p_values < 0.05)
+    if not quiet():
+        for p_value in p_values:
+            print(f"Heteroskedasticity test p-value: {p_value}")
+            if p_value < 0.05 and cov_type != 'nonrobust':
+                print(f"Heteroskedasticity detected. Using {cov_type} standard errors.")
+            elif p_value < 0.05:
+                print("Heteroskedasticity detected. Using GLS.")
+            else:
+                print("No heteroskedasticity detected. Using OLS.")
+
+    return results
+
+def analyze_files(file_paths, metric_name, covariates, store=None, bootstrap='none', replicates=9999, block_length=None, seed=0,
+                  cov_type='nonrobust', maxlags=None, float32=False):
+    # Every protocol is reduced to its compact series as soon as it has been read
+    frames = new_frames(float32)
+    for file_path in file_paths:
+        df, airdrop_date = prepare_data(file_path, metric_name, covariates, store)
+        frames.append(os.path.basename(file_path).split('.')[0], df, metric_name, airdrop_date)
+
+    return fit_compact(frames, bootstrap, replicates, block_length, seed, cov_type, maxlags)
+
+def fit_frames(protocols, dfs, airdrop_dates, metric_name, bootstrap='none', replicates=9999, block_length=None, seed=0,
+               cov_type='nonrobust', maxlags=None, float32=False):
+    if not dfs:
+        return pd.DataFrame()
+    # Frames built elsewhere (e.g. the benchmark's longer histories) set the window shape:
+    # its length and the first row with X = 1
+    frames = new_frames(float32, len(dfs[0]), int((dfs[0]['X'] == 0).sum()))
+    for protocol, df, airdrop_date in zip(protocols, dfs, airdrop_dates):
+        frames.append(protocol, df, metric_name, airdrop_date)
+
+    return fit_compact(frames, bootstrap, replicates, block_length, seed, cov_type, maxlags)
+
+def fit_compact(frames, bootstrap='none', replicates=9999, block_length=None, seed=0, cov_type='nonrobust', maxlags=None):
+    if not len(frames):
+        return pd.DataFrame()
+
+    columns = dict(RESULT_COLUMNS)
+    if bootstrap != 'none':
+        # Bootstrap percentile intervals, placed before the airdrop date column
+        for name, label in BOOTSTRAP_LABELS.items():
+            columns[f'ci_lower_{name}'] = f'CI lower ({label})'
+            columns[f'ci_upper_{name}'] = f'CI upper ({label})'
+    records = result_records(len(frames), columns)
+
+    exog_names = frames.exog_names
+    projections = WindowProjections()
+    for start, stop, X, y in frames.chunks():
+        results = fit_model(X, y, exog_names, cov_type, maxlags, projections)
+        for k, name in enumerate(exog_names):
+            records[name][start:stop] = results.params_array[:, k]
+            if f'p_{name}' in columns:
+                records[f'p_{name}'][start:stop] = results.pvalues_array[:, k]
+
+        if bootstrap != 'none':
+            with timer('bootstrap'):
+                lower, upper = bootstrap_intervals(results, frames.protocols[start:stop], list(BOOTSTRAP_LABELS),
+                                                   method=bootstrap, replicates=replicates, block_length=block_length,
+                                                   seed=seed)
+            for k, name in enumerate(BOOTSTRAP_LABELS):
+                records[f'ci_lower_{name}'][start:stop] = lower[:, k]
+                records[f'ci_upper_{name}'][start:stop] = upper[:, k]
+    count('window_projection_hits', projections.hits, model='analysis')
+
+    return records_frame(frames.protocols, records, columns, frames.airdrop_dates())
+
+def analyze_protocol_type(folder_path, metric_name, protocol_type, covariates, workers=1, cache=None, store=None, **options):
+    if store is not None:
+        file_paths = store.list_files(folder_path)
+    else:
+        file_paths = [os.path.join(folder_path, file) for file in os.listdir(folder_path) if file.endswith('.csv')]
+    spec = result_spec(MODEL_SPEC, metric_name, options)
+    return run_cached(cache, spec, covariates, COVARIATE_COLUMNS, file_paths,
+                      lambda paths: map_protocol_chunks(analyze_files, paths, metric_name, covariates, workers,
+                                                        store=store, **options),
+                      store)
+
+def report_results(results, protocol_type, result_folder='result'):
+    if not quiet():
+        print(results)
+    print(f"\n{protocol_type} Average Effects:")
+    print(f"Average immediate effect: {results['α2 or β2 or γ2 (X)'].mean()}")
+    print(f"Average slope change: {results['α3 or β3 or γ3 (X*T)'].mean()}")
+    print(f"Average market cap effect: {results['δ (MCt)'].mean()}")
+    print(f"Average S&P 500 effect: {results['S&P 500'].mean()}")
+    print(f"Protocols with significant immediate effect: {(results['p_value (X)'] < 0.05).sum()}/{len(results)}")
+    print(f"Protocols with significant slope change: {(results['p_value (X*T)'] < 0.05).sum()}/{len(results)}")
+    print(f"Protocols with significant market cap effect: {(results['p_value (MCt)'] < 0.05).sum()}/{len(results)}")
+    print(f"Protocols with significant S&P 500 effect: {(results['p_value (S&P 500)'] < 0.05).sum()}/{len(results)}")
+
+    # Create 'result' folder if it doesn't exist
+    if not os.path.exists(result_folder):
+        os.makedirs(result_folder)
+
+    # Save results to CSV in the 'result' folder
+    with timer('write'):
+        results.to_csv(os.path.join(result_folder, f'{protocol_type.lower()}_analysis_results.csv'), index=False)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Interrupted time series analysis of airdrop effects')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes (default: 1, run serially)')
+    parser.add_argument('--bootstrap', choices=['none'] + BOOTSTRAP_METHODS, default='none', help='add bootstrap confidence intervals for X, X*T, MCt and S&P 500 (default: none)')
+    parser.add_argument('--replicates', type=int, default=9999, help='number of bootstrap replicates per protocol (default: 9999)')
+    parser.add_argument('--block-length', type=int, default=None, help='block length in days (default: 1 for wild, nobs^(1/3) for block)')
+    parser.add_argument('--seed', type=int, default=0, help='bootstrap random seed (default: 0)')
+    parser.add_argument('--cov-type', choices=COV_TYPES, default='nonrobust', help='robust standard errors for protocols where Breusch-Pagan rejects, from the same OLS solve (default: nonrobust)')
+    parser.add_argument('--maxlags', type=int, default=None, help='Newey-West lags for --cov-type HAC (default: floor(4 (nobs/100)^(2/9)))')
+    parser.add_argument('--store', default=None, help='read protocols and covariates from a columnar store built by ingest.py instead of the CSVs')
+    parser.add_argument('--float32', action='store_true', help='keep the metric and covariate series in float32 until they are fitted, halving their memory (the fits are still in float64)')
+    add_cache_arguments(parser)
+    add_history_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+    set_quiet(args.quiet)
+    cache = cache_from_args(args)
+    history = history_from_args(args, 'analysis')
+    store = ColumnarStore(args.store) if args.store else None
+
+    # Load market capitalization and S&P 500 data once
+    covariates = store.covariates(COVARIATE_COLUMNS) if store else CovariateStore.from_csv(COVARIATE_COLUMNS)
+    print("Market cap data loaded. Date range:", covariates.date_ranges['MCt'][0], "to", covariates.date_ranges['MCt'][1])
+    print("S&P 500 data loaded. Date range:", covariates.date_ranges['Close'][0], "to", covariates.date_ranges['Close'][1])
+
+    # Analyze each protocol type
+    protocol_types = [('TVL', 'TVL', 'DeFi'), ('Volume', 'Volume', 'DEX'), ('DAU', 'DAU', 'SocialFi')]
+    result_folder = 'result'
+
+    for folder, metric, protocol_type in protocol_types:
+        print(f"\nAnalysis for {protocol_type}:")
+        options = dict(bootstrap=args.bootstrap, replicates=args.replicates, block_length=args.block_length,
+                       seed=args.seed, cov_type=args.cov_type, maxlags=args.maxlags, float32=args.float32)
+        results = analyze_protocol_type(folder, metric, protocol_type, covariates, args.workers, cache, store, **options)
+
+        if results.empty:
+            print(f"No results for {protocol_type}. Skipping...")
+            continue
+
+        report_results(results, protocol_type, result_folder)
+        if history is not None:
+            history.append('analysis', protocol_type, result_spec(MODEL_SPEC, metric, options), results)
+
+    print(f"\nResults have been saved in the '{result_folder}' folder.")
+    write_metrics(args, 'analysis')
+
+if __name__ == '__main__':
+    main()
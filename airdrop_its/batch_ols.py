@@ -0,0 +1,289 @@
+import numpy as np
+import pandas as pd
+
+COV_TYPES = ['nonrobust', 'HC0', 'HC1', 'HC2', 'HC3', 'HAC']
+
+
+def stack_designs(dfs, columns, metric_name):
+    # Stack every protocol's design matrix into one (protocols, rows, columns) array
+    lengths = {len(df) for df in dfs}
+    if len(lengths) != 1:
+        raise ValueError(f"All protocols must have the same number of rows to be stacked, got {sorted(lengths)}")
+
+    X = np.stack([np.column_stack([np.ones(len(df)), df[columns].to_numpy(dtype=float)]) for df in dfs])
+    y = np.stack([df[metric_name].to_numpy(dtype=float) for df in dfs])
+    return X, y
+
+
+def stack_ragged(designs, endogs):
+    # Zero-pad designs with different numbers of rows and columns into one stack. Zero rows
+    # and columns leave every protocol's X'X and X'y unchanged, so the pseudo-inverse solve
+    # gives each protocol its own fit; a padded column comes out with coefficient 0 and
+    # lowers the rank, so df_resid stays right.
+    nobs = np.array([len(y) for y in endogs])
+    X = np.zeros((len(designs), nobs.max(), max(design.shape[1] for design in designs)))
+    y = np.zeros((len(designs), nobs.max()))
+    for i, (design, endog) in enumerate(zip(designs, endogs)):
+        X[i, :len(endog), :design.shape[1]] = design
+        y[i, :len(endog)] = endog
+    return X, y, nobs
+
+
+def batched_pinv(X, rcond=1e-15):
+    # Same cutoff rule as statsmodels' pinv_extended, applied to every matrix in the stack
+    u, s, vt = np.linalg.svd(X, full_matrices=False)
+    cutoff = rcond * s.max(axis=-1, keepdims=True)
+    s_inv = np.divide(1.0, s, out=np.zeros_like(s), where=s > cutoff)
+    pinv = np.swapaxes(vt, -1, -2) @ (s_inv[..., :, np.newaxis] * np.swapaxes(u, -1, -2))
+    return pinv, s
+
+
+class WindowProjections:
+    # Pseudo-inverses and singular values of the designs already solved, keyed by the design's
+    # bytes. Protocols airdropping in the same calendar window share the whole design (the ITS
+    # columns come from one template, the covariates from the same dates), so the SVD of a
+    # window is done once and reused by every protocol in it, across chunks. The pseudo-inverse
+    # of a design does not depend on the other matrices of the stack, so the fits are unchanged.
+    def __init__(self, max_windows=4096):
+        self.max_windows = max_windows
+        self.windows = {}
+        self.hits = 0
+
+    def __len__(self):
+        return len(self.windows)
+
+    def pinv(self, X):
+        # Same result as batched_pinv(X), with one SVD per distinct design
+        flat = np.ascontiguousarray(X).reshape(len(X), -1)
+        rows = flat.view(np.dtype((np.void, flat.shape[1] * flat.itemsize)))[:, 0]
+        _, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+        keys = [rows[i].tobytes() for i in first]
+
+        found = {key: self.windows[key] for key in keys if key in self.windows}
+        self.hits += len(X) - (len(keys) - len(found))
+        missing = [j for j, key in enumerate(keys) if key not in found]
+        if missing:
+            # Copied in the layout of the stack, so the SVD sees the same input
+            designs = np.empty_like(X[:len(missing)])
+            designs[:] = X[first[missing]]
+            pinv, singular_values = batched_pinv(designs)
+            for j, window_pinv, window_singular_values in zip(missing, pinv, singular_values):
+                found[keys[j]] = (window_pinv, window_singular_values)
+                if len(self.windows) >= self.max_windows:
+                    del self.windows[next(iter(self.windows))]
+                self.windows[keys[j]] = found[keys[j]]
+
+        pinv = np.stack([found[key][0] for key in keys])
+        singular_values = np.stack([found[key][1] for key in keys])
+        return pinv[inverse], singular_values[inverse]
+
+
+class BatchOLSResults:
+    def __init__(self, exog, endog, exog_names, pinv, singular_values, nobs=None):
+        from scipy import special
+        self.exog = exog
+        self.endog = endog
+        self.exog_names = exog_names
+        self.pinv = pinv
+        # Per-protocol row counts when the stack is zero-padded
+        self.nobs = exog.shape[1] if nobs is None else nobs
+
+        # np.linalg.matrix_rank(np.diag(s)) as used by statsmodels
+        tol = singular_values.max(axis=-1) * exog.shape[2] * np.finfo(float).eps
+        self.rank = (singular_values > tol[:, np.newaxis]).sum(axis=1)
+        self.df_resid = self.nobs - self.rank
+
+        self.normalized_cov_params = pinv @ np.swapaxes(pinv, -1, -2)
+        self.params_array = (pinv @ endog[:, :, np.newaxis])[:, :, 0]
+        self.resid = endog - (exog @ self.params_array[:, :, np.newaxis])[:, :, 0]
+        self.ssr = (self.resid[:, np.newaxis, :] @ self.resid[:, :, np.newaxis])[:, 0, 0]
+        self.scale = self.ssr / self.df_resid
+
+        self.bse_array = np.sqrt(np.diagonal(self.normalized_cov_params, axis1=1, axis2=2) * self.scale[:, np.newaxis])
+        self.tvalues_array = self.params_array / self.bse_array
+        self.pvalues_array = special.stdtr(self.df_resid[:, np.newaxis], -np.abs(self.tvalues_array)) * 2
+
+    @property
+    def params(self):
+        return pd.DataFrame(self.params_array, columns=self.exog_names)
+
+    @property
+    def bse(self):
+        return pd.DataFrame(self.bse_array, columns=self.exog_names)
+
+    @property
+    def pvalues(self):
+        return pd.DataFrame(self.pvalues_array, columns=self.exog_names)
+
+    def cov_params(self):
+        return self.normalized_cov_params * self.scale[:, np.newaxis, np.newaxis]
+
+    def robust_cov_params(self, cov_type, maxlags=None):
+        # Sandwich covariances of statsmodels' OLS.fit(cov_type=...), built from the stored
+        # pseudo-inverse instead of a second solve
+        if cov_type == 'HAC':
+            # Newey-West with Bartlett weights, no small-sample correction
+            if maxlags is None:
+                maxlags = np.floor(4 * (np.reshape(self.nobs, (-1, 1, 1)) / 100.0) ** (2.0 / 9.0)).astype(int)
+            xu = self.exog * self.resid[:, :, np.newaxis]
+            xu_t = np.swapaxes(xu, -1, -2)
+            S = xu_t @ xu
+            for lag in range(1, int(np.max(maxlags)) + 1):
+                # Weights of protocols with fewer lags are clipped to zero
+                s = xu_t[:, :, lag:] @ xu[:, :-lag]
+                S += np.maximum(1 - lag / (maxlags + 1.0), 0) * (s + np.swapaxes(s, -1, -2))
+            xxi = self.normalized_cov_params
+            return xxi @ S @ np.swapaxes(xxi, -1, -2)
+
+        if cov_type == 'HC0':
+            het_scale = self.resid ** 2
+        elif cov_type == 'HC1':
+            het_scale = (self.nobs / self.df_resid)[:, np.newaxis] * self.resid ** 2
+        elif cov_type in ('HC2', 'HC3'):
+            # Leverage of every observation, diag(X (X'X)^-1 X')
+            h = ((self.exog @ self.normalized_cov_params) * self.exog).sum(axis=2)
+            het_scale = self.resid ** 2 / (1 - h) if cov_type == 'HC2' else (self.resid / (1 - h)) ** 2
+        else:
+            raise ValueError(f"Unknown covariance type {cov_type}, expected one of {COV_TYPES}")
+        return self.pinv @ (het_scale[:, :, np.newaxis] * np.swapaxes(self.pinv, -1, -2))
+
+    def apply_robust_cov(self, cov_type, maxlags=None, mask=None):
+        # Replace the standard errors, t- and p-values of the masked protocols (all by default);
+        # like statsmodels, robust p-values use the normal distribution
+        from scipy import special
+        if cov_type == 'nonrobust':
+            return
+        mask = np.ones(len(self.params_array), dtype=bool) if mask is None else np.asarray(mask)
+        bse = np.sqrt(np.diagonal(self.robust_cov_params(cov_type, maxlags), axis1=1, axis2=2))
+        tvalues = self.params_array / bse
+        self.bse_array = np.where(mask[:, np.newaxis], bse, self.bse_array)
+        self.tvalues_array = np.where(mask[:, np.newaxis], tvalues, self.tvalues_array)
+        self.pvalues_array = np.where(mask[:, np.newaxis], special.ndtr(-np.abs(tvalues)) * 2, self.pvalues_array)
+
+
+def fit_ols_stack(X, y, exog_names, projections=None):
+    # Batched fit of an already stacked (protocols, rows, columns) design; with a
+    # WindowProjections cache, protocols of the same window share one SVD
+    pinv, singular_values = batched_pinv(X) if projections is None else projections.pinv(X)
+    return BatchOLSResults(X, y, list(exog_names), pinv, singular_values)
+
+
+def fit_ols_batch(dfs, columns, metric_name):
+    X, y = stack_designs(dfs, columns, metric_name)
+    return fit_ols_stack(X, y, ['const'] + list(columns))
+
+
+def fit_ols_ragged(designs, endogs, exog_names):
+    # One batched solve over designs of different lengths and widths (constant included);
+    # exog_names label the widest design
+    X, y, nobs = stack_ragged(designs, endogs)
+    pinv, singular_values = batched_pinv(X)
+    return BatchOLSResults(X, y, list(exog_names), pinv, singular_values, nobs)
+
+
+def het_breuschpagan_batch(results):
+    # Koenker's LM version (statsmodels' robust=True default), reusing the fitted pseudo-inverse
+    from scipy import special
+    u2 = results.resid ** 2
+    aux_params = (results.pinv @ u2[:, :, np.newaxis])[:, :, 0]
+    aux_resid = u2 - (results.exog @ aux_params[:, :, np.newaxis])[:, :, 0]
+    centered_tss = ((u2 - u2.mean(axis=1, keepdims=True)) ** 2).sum(axis=1)
+    rsquared = 1 - (aux_resid ** 2).sum(axis=1) / centered_tss
+    lm = results.nobs * rsquared
+    return lm, special.chdtrc(results.exog.shape[2] - 1, lm)
+
+
+def ljung_box_batch(resid, lags=None):
+    # statsmodels' acorr_ljungbox at the largest lag (default min(10, nobs // 5)): autocorrelations
+    # of the demeaned residuals normalized by nobs, no model degrees of freedom subtracted
+    from scipy import special
+    nobs = resid.shape[1]
+    if lags is None:
+        lags = min(10, nobs // 5)
+    x = resid - resid.mean(axis=1, keepdims=True)
+    acov0 = (x * x).sum(axis=1)
+    q = np.zeros(len(x))
+    for lag in range(1, lags + 1):
+        acf = (x[:, lag:] * x[:, :-lag]).sum(axis=1) / acov0
+        q += acf ** 2 / (nobs - lag)
+    q *= nobs * (nobs + 2)
+    return q, special.chdtrc(lags, q)
+
+
+def breusch_godfrey_batch(results, nlags=None):
+    # LM version of statsmodels' acorr_breusch_godfrey: the residuals regressed on the design
+    # and their own lags (zero before the sample), nobs * R^2 against chi2(nlags)
+    from scipy import special
+    resid = results.resid
+    nobs = resid.shape[1]
+    if nlags is None:
+        nlags = min(10, nobs // 5)
+    lagged = np.zeros(resid.shape + (nlags,))
+    for lag in range(1, nlags + 1):
+        lagged[:, lag:, lag - 1] = resid[:, :-lag]
+    aux_exog = np.concatenate([results.exog, lagged], axis=2)
+    pinv, _ = batched_pinv(aux_exog)
+    aux_resid = resid - (aux_exog @ (pinv @ resid[:, :, np.newaxis]))[:, :, 0]
+    centered_tss = ((resid - resid.mean(axis=1, keepdims=True)) ** 2).sum(axis=1)
+    lm = nobs * (1 - (aux_resid ** 2).sum(axis=1) / centered_tss)
+    return lm, special.chdtrc(nlags, lm)
+
+
+def yule_walker_ar1(resid):
+    # statsmodels' yule_walker(order=1, method='adjusted'): demeaned autocovariances divided
+    # by nobs and nobs - 1
+    x = resid - resid.mean(axis=1, keepdims=True)
+    nobs = x.shape[1]
+    return ((x[:, 1:] * x[:, :-1]).sum(axis=1) / (nobs - 1)) / ((x * x).sum(axis=1) / nobs)
+
+
+def ar1_whiten(X, y, rho, method='prais-winsten'):
+    # Quasi-differences z_t - rho z_{t-1}; Prais-Winsten keeps the first row scaled by
+    # sqrt(1 - rho^2), Cochrane-Orcutt drops it
+    wy = y[:, 1:] - rho[:, np.newaxis] * y[:, :-1]
+    wX = X[:, 1:] - rho[:, np.newaxis, np.newaxis] * X[:, :-1]
+    if method == 'prais-winsten':
+        scale = np.sqrt(np.maximum(1 - rho ** 2, 0))
+        wy = np.concatenate([scale[:, np.newaxis] * y[:, :1], wy], axis=1)
+        wX = np.concatenate([scale[:, np.newaxis, np.newaxis] * X[:, :1], wX], axis=1)
+    return wX, wy
+
+
+def fit_ar1_batch(X, y, exog_names, method='prais-winsten', maxiter=50, rtol=1e-4):
+    # Iterated feasible GLS with AR(1) errors for a stack of protocols, following statsmodels'
+    # GLSAR.iterative_fit: fit on the whitened data, re-estimate rho from the residuals on the
+    # original scale and refit until the largest relative change of the coefficients is below
+    # rtol. Converged protocols leave the batch, so later iterations only solve the others.
+    n_protocols = len(y)
+    rho = np.zeros(n_protocols)
+    params = np.full((n_protocols, X.shape[2]), np.nan)
+    pvalues = np.full((n_protocols, X.shape[2]), np.nan)
+    iterations = np.full(n_protocols, maxiter)
+    converged = np.zeros(n_protocols, dtype=bool)
+
+    active = np.arange(n_protocols)
+    last = None
+    for i in range(maxiter - 1):
+        results = fit_ols_stack(*ar1_whiten(X[active], y[active], rho[active], method), exog_names)
+        if last is not None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                done = np.max(np.abs(last - results.params_array) / np.abs(last), axis=1) < rtol
+            params[active[done]] = results.params_array[done]
+            pvalues[active[done]] = results.pvalues_array[done]
+            iterations[active[done]] = i + 1
+            converged[active[done]] = True
+            active = active[~done]
+            if not len(active):
+                break
+            last = results.params_array[~done]
+        else:
+            last = results.params_array
+        resid = y[active] - (X[active] @ last[:, :, np.newaxis])[:, :, 0]
+        rho[active] = yule_walker_ar1(resid)
+
+    # Protocols that did not converge keep the fit with the last rho
+    if len(active):
+        results = fit_ols_stack(*ar1_whiten(X[active], y[active], rho[active], method), exog_names)
+        params[active] = results.params_array
+        pvalues[active] = results.pvalues_array
+    return params, pvalues, rho, iterations, converged
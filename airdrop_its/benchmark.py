@@ -0,0 +1,229 @@
+import pandas as pd
+import numpy as np
+import os
+import sys
+import io
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import tracemalloc
+import warnings
+import contextlib
+from datetime import datetime
+from . import analysis
+from .covariates import CovariateStore
+from .columnar import read_protocol
+
+ENGINES = ['batched', 'statsmodels']
+
+# Typical level, daily log-volatility and airdrop jump of each metric
+METRIC_PROFILES = {
+    'TVL': {'level': 2e8, 'volatility': 0.03, 'noise': 0.01, 'jump': 0.3},
+    'Volume': {'level': 3e7, 'volatility': 0.05, 'noise': 0.35, 'jump': 0.6},
+    'DAU': {'level': 2e4, 'volatility': 0.04, 'noise': 0.2, 'jump': 0.8}
+}
+
+def synthetic_series(rng, metric, days, airdrop_index):
+    # Log random walk with a level shift and a decaying trend after the airdrop,
+    # plus day-to-day noise (large for volume, small for TVL)
+    profile = METRIC_PROFILES[metric]
+    steps = rng.normal(0, profile['volatility'], days)
+    steps[airdrop_index:] += rng.normal(0, profile['volatility']) - 0.002
+    log_level = np.log(profile['level'] * rng.lognormal(0, 1)) + np.cumsum(steps)
+    log_level[airdrop_index:] += rng.normal(profile['jump'], profile['jump'] / 2)
+    values = np.exp(log_level + rng.normal(0, profile['noise'], days))
+    return np.round(values) if metric == 'DAU' else np.round(values, 1)
+
+def generate_folder(folder, metric, protocols, days, covariates, seed):
+    # Protocol CSVs in the layout of the real folders, dated inside the covariate history
+    rng = np.random.default_rng(seed)
+    os.makedirs(folder, exist_ok=True)
+    last_day = covariates.date_ranges['MCt'][1]
+    first_day = covariates.date_ranges['MCt'][0]
+    latest_start = max((last_day - first_day).days - days + 1, 0)
+    for k in range(protocols):
+        start = first_day + pd.Timedelta(days=int(rng.integers(0, latest_start + 1)))
+        dates = pd.date_range(start, periods=days, freq='D')
+        df = pd.DataFrame({'Date': dates.strftime('%d/%m/%Y'),
+                           metric: synthetic_series(rng, metric, days, days // 2)})
+        df.to_csv(os.path.join(folder, f'protocol{k:06d}.csv'), index=False)
+
+def build_frame(df, covariates):
+    # analysis.build_frame for 61-day files; longer histories get the same columns
+    # with the airdrop in the middle row
+    if len(df) == 61:
+        return analysis.build_frame(df, covariates)
+    df = df.sort_values('Date').reset_index(drop=True)
+    n, airdrop_index = len(df), len(df) // 2
+    airdrop_date = df['Date'].iloc[airdrop_index]
+    df['T'] = np.arange(n) - airdrop_index
+    df['X'] = np.where(df.index < airdrop_index, 0, 1)
+    df['X_T'] = df['X'] * df['T']
+    df['t'] = np.arange(1, n + 1)
+    df['t_X'] = df['t'] * df['X']
+    for column, values in covariates.window(df['Date'], analysis.COVARIATE_COLUMNS).items():
+        df[column] = values
+    return df, airdrop_date
+
+def prepare_stage(folder, covariates):
+    file_paths = [os.path.join(folder, file) for file in sorted(os.listdir(folder))]
+    built = [build_frame(read_protocol(file_path), covariates) for file_path in file_paths]
+    protocols = [os.path.basename(file_path).split('.')[0] for file_path in file_paths]
+    return protocols, [df for df, _ in built], [date for _, date in built]
+
+def fit_statsmodels(protocols, dfs, airdrop_dates, metric):
+    # Per-protocol OLS and Breusch-Pagan, as the scripts did before the batched engine;
+    # statsmodels is only imported when this engine is benchmarked
+    import statsmodels.api as sm
+    from statsmodels.stats.diagnostic import het_breuschpagan
+    rows = []
+    columns = ['T', 'X', 'X_T', 't', 't_X', 'MCt', 'Close']
+    for protocol, df, airdrop_date in zip(protocols, dfs, airdrop_dates):
+        X = sm.add_constant(df[columns])
+        results = sm.OLS(df[metric], X).fit()
+        het_breuschpagan(results.resid, results.model.exog)
+        rows.append({'protocol': protocol, **results.params.to_dict(),
+                     **{f'p_value ({column})': results.pvalues[column] for column in ['X', 'X_T', 'MCt', 'Close']},
+                     'airdrop_date': airdrop_date})
+    return pd.DataFrame(rows)
+
+def fit_stage(engine, protocols, dfs, airdrop_dates, metric):
+    # The scripts print one line per protocol while fitting; that output and the
+    # rank-deficiency warnings of statsmodels are not part of the timing
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        if engine == 'batched':
+            return analysis.fit_frames(protocols, dfs, airdrop_dates, metric)
+        return fit_statsmodels(protocols, dfs, airdrop_dates, metric)
+
+def measure(stage, trace_memory, repeat=1):
+    # Best wall time of repeated calls, and optionally the peak traced allocation of one more call
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = stage()
+        timings.append(time.perf_counter() - start)
+    record = {'seconds': min(timings)}
+    if trace_memory:
+        tracemalloc.start()
+        stage()
+        record['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, record
+
+def run_scenario(workdir, metric, protocols, days, engines, covariates, seed, trace_memory, repeat):
+    folder = os.path.join(workdir, f'{metric}_{protocols}x{days}')
+    shutil.rmtree(folder, ignore_errors=True)
+    _, generate = measure(lambda: generate_folder(folder, metric, protocols, days, covariates, seed), False)
+    (names, dfs, airdrop_dates), prepare = measure(lambda: prepare_stage(folder, covariates), trace_memory, repeat)
+
+    scenarios = []
+    for engine in engines:
+        results, fit = measure(lambda: fit_stage(engine, names, dfs, airdrop_dates, metric), trace_memory, repeat)
+        output = os.path.join(workdir, f'{engine}_results.csv')
+        _, write = measure(lambda: results.to_csv(output, index=False), trace_memory, repeat)
+        stages = {'prepare': prepare, 'fit': fit, 'write': write}
+        scenarios.append({
+            'metric': metric,
+            'protocols': protocols,
+            'days': days,
+            'engine': engine,
+            'repeat': repeat,
+            'generate_seconds': generate['seconds'],
+            'stages': stages,
+            'total_seconds': sum(record['seconds'] for record in stages.values())
+        })
+    shutil.rmtree(folder, ignore_errors=True)
+    return scenarios
+
+def environment():
+    import scipy
+    import statsmodels
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'scipy': scipy.__version__,
+        'statsmodels': statsmodels.__version__
+    }
+
+def summary_table(report):
+    rows = []
+    for scenario in report['scenarios']:
+        row = {key: scenario[key] for key in ['metric', 'protocols', 'days', 'engine']}
+        for stage, record in scenario['stages'].items():
+            row[f'{stage} s'] = record['seconds']
+            if 'peak_bytes' in record:
+                row[f'{stage} peak MB'] = record['peak_bytes'] / 2 ** 20
+        row['total s'] = scenario['total_seconds']
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def compare_reports(report, baseline, tolerance):
+    # Stage timings relative to an earlier report; ratios above the tolerance are flagged
+    key_columns = ['metric', 'protocols', 'days', 'engine']
+    merged = summary_table(report).merge(summary_table(baseline), on=key_columns, suffixes=('', ' baseline'))
+    time_columns = [column for column in summary_table(report).columns if column.endswith(' s')]
+    for column in time_columns:
+        merged[f'{column} ratio'] = merged[column] / merged[f'{column} baseline']
+    ratios = merged[key_columns + [f'{column} ratio' for column in time_columns]]
+    regressions = (ratios[[f'{column} ratio' for column in time_columns]] > tolerance).any(axis=1)
+    return ratios, regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark prepare_data, fit_model and the result writing on synthetic protocol folders')
+    parser.add_argument('--protocols', type=int, nargs='+', default=[10, 100, 1000], help='numbers of synthetic protocols (default: 10 100 1000)')
+    parser.add_argument('--days', type=int, nargs='+', default=[61, 365, 730], help='days per protocol (default: 61 365 730)')
+    parser.add_argument('--metric', choices=list(METRIC_PROFILES), default='TVL', help='shape of the synthetic series (default: TVL)')
+    parser.add_argument('--engines', choices=ENGINES, nargs='+', default=ENGINES, help='fitting engines to compare (default: batched statsmodels)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the synthetic data (default: 0)')
+    parser.add_argument('--repeat', type=int, default=3, help='report the best of this many runs of each stage (default: 3)')
+    parser.add_argument('--no-memory', action='store_true', help='skip the second, tracemalloc-traced run of each stage')
+    parser.add_argument('--workdir', default=None, help='folder for the synthetic CSVs (default: a temporary folder)')
+    parser.add_argument('--output', default=os.path.join('benchmark', 'report.json'), help='JSON report path (default: benchmark/report.json)')
+    parser.add_argument('--compare', default=None, help='earlier JSON report to compare the timings against')
+    parser.add_argument('--tolerance', type=float, default=1.2, help='flag stages slower than this ratio of the earlier report (default: 1.2)')
+    args = parser.parse_args(argv)
+
+    # Real covariate files, as in the analysis
+    covariates = CovariateStore.from_csv(analysis.COVARIATE_COLUMNS)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='airdrop_benchmark_')
+    report = {'created': datetime.now().isoformat(timespec='seconds'), 'environment': environment(), 'scenarios': []}
+    try:
+        for protocols in args.protocols:
+            for days in args.days:
+                print(f"Benchmarking {protocols} protocols x {days} days...")
+                report['scenarios'] += run_scenario(workdir, args.metric, protocols, days, args.engines, covariates,
+                                                    args.seed, not args.no_memory, args.repeat)
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(summary_table(report).to_string(index=False))
+
+    output_folder = os.path.dirname(args.output)
+    if output_folder and not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f"\nBenchmark report has been saved to '{args.output}'.")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        ratios, regressions = compare_reports(report, baseline, args.tolerance)
+        print(f"\nTimings relative to '{args.compare}':")
+        print(ratios.to_string(index=False))
+        if regressions.any():
+            print(f"{regressions.sum()} scenario(s) slower than {args.tolerance}x the earlier report")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import zlib
+
+import numpy as np
+
+BOOTSTRAP_METHODS = ['wild', 'block']
+
+
+def protocol_rng(seed, protocol):
+    # One stream per protocol, so the draws do not depend on how protocols are chunked
+    return np.random.default_rng([seed, zlib.crc32(protocol.encode())])
+
+
+def default_block_length(nobs):
+    return max(1, int(round(nobs ** (1 / 3))))
+
+
+def resample_residuals(resid, method, replicates, block_length, rng):
+    # (replicates, nobs) bootstrap residual series built from one protocol's OLS residuals
+    nobs = len(resid)
+    block_length = min(block_length, nobs)
+    n_blocks = -(-nobs // block_length)
+
+    if method == 'wild':
+        # Rademacher multipliers, shared within blocks of block_length days (block_length=1: plain wild)
+        signs = rng.integers(0, 2, size=(replicates, n_blocks), dtype=np.int8) * 2 - 1
+        return resid * np.repeat(signs, block_length, axis=1)[:, :nobs]
+
+    if method == 'block':
+        # Moving-block bootstrap: concatenate randomly chosen overlapping blocks of residuals
+        starts = rng.integers(0, nobs - block_length + 1, size=(replicates, n_blocks))
+        index = (starts[:, :, np.newaxis] + np.arange(block_length)).reshape(replicates, -1)[:, :nobs]
+        return resid[index]
+
+    raise ValueError(f"Unknown bootstrap method '{method}', expected one of {BOOTSTRAP_METHODS}")
+
+
+def bootstrap_intervals(results, protocols, columns, method='wild', replicates=9999, block_length=None,
+                        alpha=0.05, seed=0, max_chunk_elements=2 ** 24):
+    # With the design fixed, every replicate is params + pinv @ resampled residuals, so a chunk
+    # of protocols is one batched (replicates, nobs) x (nobs, columns) product per protocol
+    if block_length is None:
+        block_length = 1 if method == 'wild' else default_block_length(results.nobs)
+
+    index = [results.exog_names.index(column) for column in columns]
+    pinv_t = np.swapaxes(results.pinv[:, index, :], 1, 2)
+    params = results.params_array[:, index]
+
+    n_protocols = len(protocols)
+    chunk = max(1, max_chunk_elements // (replicates * results.nobs))
+    lower = np.empty((n_protocols, len(index)))
+    upper = np.empty((n_protocols, len(index)))
+    for start in range(0, n_protocols, chunk):
+        stop = min(start + chunk, n_protocols)
+        resampled = np.stack([
+            resample_residuals(results.resid[i], method, replicates, block_length, protocol_rng(seed, protocols[i]))
+            for i in range(start, stop)
+        ])
+        draws = params[start:stop, np.newaxis, :] + resampled @ pinv_t[start:stop]
+        lower[start:stop], upper[start:stop] = np.quantile(draws, [alpha / 2, 1 - alpha / 2], axis=1)
+
+    return lower, upper
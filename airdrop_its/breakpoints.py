@@ -0,0 +1,146 @@
+import pandas as pd
+import numpy as np
+import os
+import argparse
+from .bootstrap import protocol_rng
+from .covariates import CovariateStore
+from .columnar import ColumnarStore, read_protocol
+from .suffstats import break_sweep, chow_sweep, standardize
+
+# Covariates of the fit_model specification in posterior.py
+COVARIATE_COLUMNS = ['MCt', 'Fear_Greed_Index', 'Close']
+SIGNIFICANCE_LEVELS = [0.10, 0.05, 0.01]
+
+def prepare_data(file_path, metric_name, covariates, store=None):
+    df = read_protocol(file_path, store)
+    df = df.sort_values('Date').reset_index(drop=True)
+
+    for column, values in covariates.window(df['Date'], COVARIATE_COLUMNS).items():
+        df[column] = values
+
+    return df
+
+def candidate_breaks(nobs, trim):
+    # Break rows b (first row of the new regime) leaving at least trim * nobs rows, and two rows
+    # for the slope, on each side
+    margin = max(int(np.ceil(trim * nobs)), 2)
+    return np.arange(margin, nobs - margin + 1)
+
+def scan_protocol(df, metric_name, breaks, replicates, rng):
+    # Base regressors: intercept, time trend and market covariates. A level (X) and slope (X*T)
+    # change is tested at every candidate break row.
+    n = len(df)
+    Z = standardize(np.column_stack([np.ones(n), np.arange(n), df[COVARIATE_COLUMNS].to_numpy(dtype=float)]))
+    y = df[metric_name].to_numpy(dtype=float)
+    y_scale = y.std() or 1.0
+    observed = chow_sweep(Z, y / y_scale, breaks)
+
+    # Without a break and with iid normal errors the F statistics depend on neither the
+    # coefficients of Z nor the error variance, so standard normal series give the exact
+    # null distribution of sup-F for this protocol's design (Andrews' tables assume
+    # stationary regressors and do not apply with the time trend)
+    null = chow_sweep(Z, rng.standard_normal((replicates, n)), breaks).fvalues.max(axis=1)
+
+    sweep = break_sweep(Z, y / y_scale, breaks)
+    return observed, null, sweep, y_scale
+
+def analyze_protocol_type(folder_path, metric_name, protocol_type, covariates, trim, replicates, seed, store=None):
+    from scipy import special
+    if store is not None:
+        file_paths = store.list_files(folder_path)
+    else:
+        file_paths = [os.path.join(folder_path, file) for file in os.listdir(folder_path) if file.endswith('.csv')]
+
+    all_results = []
+    for file_path in file_paths:
+        protocol = os.path.basename(file_path).split('.')[0]
+        df = prepare_data(file_path, metric_name, covariates, store)
+        airdrop_index = 30
+        breaks = candidate_breaks(len(df), trim)
+        if airdrop_index not in breaks:
+            print(f"Skipping {protocol}: the airdrop row {airdrop_index} is outside the trimmed candidate breaks")
+            continue
+        airdrop_date = df['Date'].iloc[airdrop_index]
+
+        observed, null, sweep, y_scale = scan_protocol(df, metric_name, breaks, replicates,
+                                                      protocol_rng(seed, protocol))
+        fvalues = observed.fvalues[0]
+        at_airdrop = int(np.searchsorted(breaks, airdrop_index))
+        critical_values = np.quantile(null, [1 - level for level in SIGNIFICANCE_LEVELS])
+        if np.isnan(fvalues).all():
+            # Constant (or exactly fitted) series: no break can be tested
+            print(f"No break can be tested for {protocol}: the base regressors fit the series exactly")
+            best, break_date, sup_f, p_value = None, pd.NaT, np.nan, np.nan
+        else:
+            best = int(np.nanargmax(fvalues))
+            break_date = df['Date'].iloc[breaks[best]]
+            sup_f = fvalues[best]
+            p_value = (1 + np.sum(null >= sup_f)) / (1 + replicates)
+
+        row = {
+            'protocol': protocol,
+            'break_date': break_date,
+            'days from airdrop': (break_date - airdrop_date).days if best is not None else np.nan,
+            'sup-F': sup_f,
+            'p_value (sup-F)': p_value
+        }
+        for level, critical_value in zip(SIGNIFICANCE_LEVELS, critical_values):
+            row[f'critical value ({level:.0%})'] = critical_value
+        row.update({
+            'level change (X)': sweep.params[best, -2] * y_scale if best is not None else np.nan,
+            'slope change (X*T)': sweep.params[best, -1] * y_scale if best is not None else np.nan,
+            # Chow test of the airdrop row itself, a known break date, against the F distribution
+            'Chow F (airdrop)': fvalues[at_airdrop],
+            'p_value (Chow, airdrop)': special.fdtrc(observed.df_num[at_airdrop], observed.df_resid[at_airdrop],
+                                                     fvalues[at_airdrop]),
+            'candidate breaks': len(breaks),
+            'airdrop_date': airdrop_date
+        })
+        all_results.append(row)
+
+    return pd.DataFrame(all_results)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Search every candidate break date for the regime shift of each protocol (sup-F / Chow scan)')
+    parser.add_argument('--trim', type=float, default=0.15, help='share of the rows excluded as break dates at each end of the series (default: 0.15)')
+    parser.add_argument('--replicates', type=int, default=9999, help='simulated series for the critical values and p-value of sup-F (default: 9999)')
+    parser.add_argument('--seed', type=int, default=0, help='simulation random seed (default: 0)')
+    parser.add_argument('--store', default=None, help='read protocols and covariates from a columnar store built by ingest.py instead of the CSVs')
+    args = parser.parse_args(argv)
+    if not 0 < args.trim < 0.5:
+        parser.error('--trim must be between 0 and 0.5')
+    store = ColumnarStore(args.store) if args.store else None
+
+    # Load market capitalization, Fear and Greed Index and S&P 500 data once
+    covariates = store.covariates(COVARIATE_COLUMNS) if store else CovariateStore.from_csv(COVARIATE_COLUMNS)
+
+    # Analyze each protocol type
+    protocol_types = [('TVL', 'TVL', 'DeFi'), ('Volume', 'Volume', 'DEX'), ('DAU', 'DAU', 'SocialFi')]
+
+    # Create 'breakpoints' folder if it doesn't exist
+    breakpoints_folder = 'breakpoints'
+    if not os.path.exists(breakpoints_folder):
+        os.makedirs(breakpoints_folder)
+
+    for folder, metric, protocol_type in protocol_types:
+        print(f"\nBreakpoint search for {protocol_type}:")
+        results = analyze_protocol_type(folder, metric, protocol_type, covariates, args.trim, args.replicates, args.seed,
+                                        store)
+
+        if results.empty:
+            print(f"No breakpoint results for {protocol_type}. Skipping...")
+            continue
+
+        print(results)
+        days = results['days from airdrop']
+        print(f"Protocols with a significant break (sup-F at 5%): {(results['p_value (sup-F)'] < 0.05).sum()}/{len(results)}")
+        print(f"Protocols with a significant break at the airdrop (Chow at 5%): {(results['p_value (Chow, airdrop)'] < 0.05).sum()}/{len(results)}")
+        print(f"Best break before / on / after the airdrop: {(days < 0).sum()} / {(days == 0).sum()} / {(days > 0).sum()}")
+        print(f"Median distance of the best break from the airdrop: {days.median()} days")
+
+        results.to_csv(os.path.join(breakpoints_folder, f'{protocol_type.lower()}_breakpoint_results.csv'), index=False)
+
+    print(f"\nBreakpoint results have been saved in the '{breakpoints_folder}' folder.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .covariates import CovariateStore
+from .metrics import timer
+
+INDEX_FILE = 'index.json'
+
+
+# Read side of the columnar store written by ingest.py. Protocol series are concatenated into
+# memory-mapped values.npy / days.npy (day offsets from the store origin); index.json maps every
+# source CSV to its row range. Covariates are kept as dense calendar arrays.
+class ColumnarStore:
+    def __init__(self, folder):
+        self.folder = folder
+        with open(os.path.join(folder, INDEX_FILE)) as f:
+            index = json.load(f)
+        self.origin = pd.Timestamp(index['origin'])
+        self.protocols = {os.path.normpath(os.path.join(entry['folder'], entry['file'])): entry
+                          for entry in index['protocols']}
+        self.folders = {}
+        for entry in index['protocols']:
+            self.folders.setdefault(entry['folder'], []).append(entry['file'])
+        self.covariate_index = index['covariates']
+        self.values = np.load(os.path.join(folder, 'values.npy'), mmap_mode='r')
+        self.days = np.load(os.path.join(folder, 'days.npy'), mmap_mode='r')
+
+    # Pickled by folder only, so worker processes reopen the memory maps instead of copying them
+    def __getstate__(self):
+        return {'folder': self.folder}
+
+    def __setstate__(self, state):
+        self.__init__(state['folder'])
+
+    def list_files(self, folder_path):
+        # Source file paths in the order the folder was listed at ingest
+        return [os.path.join(folder_path, file) for file in self.folders.get(os.path.normpath(folder_path), [])]
+
+    def _entry(self, file_path):
+        try:
+            return self.protocols[os.path.normpath(file_path)]
+        except KeyError:
+            raise FileNotFoundError(f"{file_path} is not in the columnar store {self.folder}") from None
+
+    def read(self, file_path):
+        entry = self._entry(file_path)
+        rows = slice(entry['start'], entry['start'] + entry['length'])
+        return pd.DataFrame({
+            'Date': self.origin + pd.to_timedelta(np.asarray(self.days[rows]), unit='D'),
+            entry['metric']: np.asarray(self.values[rows])
+        })
+
+    def raw(self, file_path):
+        # Stored bytes of one series, used in place of the CSV bytes for cache keys
+        entry = self._entry(file_path)
+        rows = slice(entry['start'], entry['start'] + entry['length'])
+        return entry['metric'].encode() + self.days[rows].tobytes() + self.values[rows].tobytes()
+
+    def date_span(self, file_path):
+        entry = self._entry(file_path)
+        days = self.days[entry['start']:entry['start'] + entry['length']]
+        return self.origin + pd.Timedelta(days=int(days.min())), self.origin + pd.Timedelta(days=int(days.max()))
+
+    def covariates(self, columns):
+        arrays = {}
+        for kind in ('values', 'prev', 'next'):
+            arrays[kind] = {column: np.load(os.path.join(self.folder, 'covariates', f'{column}.{kind}.npy'), mmap_mode='r')
+                            for column in columns}
+        date_ranges = {column: (pd.Timestamp(self.covariate_index[column]['first']),
+                                pd.Timestamp(self.covariate_index[column]['last'])) for column in columns}
+        return CovariateStore.from_arrays(self.origin, date_ranges, arrays['values'], arrays['prev'], arrays['next'])
+
+
+def read_protocol(file_path, store=None):
+    if store is not None:
+        with timer('read'):
+            return store.read(file_path)
+    with timer('read'):
+        df = pd.read_csv(file_path)
+    with timer('date_parse'):
+        df['Date'] = pd.to_datetime(df['Date'], format='%d/%m/%Y')
+    return df
@@ -0,0 +1,85 @@
+import functools
+
+import numpy as np
+import pandas as pd
+
+# Protocols per batched solve; bounds the float64 design, pseudo-inverse and residual stacks
+CHUNK_SIZE = 4096
+
+EPOCH = pd.Timestamp('1970-01-01')
+
+
+@functools.lru_cache(maxsize=None)
+def design_template(columns, nobs, airdrop_index):
+    # Constant and ITS time columns, identical for every protocol with the same window shape:
+    # T counts days from the airdrop row, t counts rows from 1, X switches on at the airdrop
+    T = np.arange(nobs, dtype=float) - airdrop_index
+    X = (T >= 0).astype(float)
+    t = np.arange(1, nobs + 1, dtype=float)
+    values = {'const': np.ones(nobs), 'T': T, 'X': X, 'X_T': X * T, 't': t, 't_X': t * X}
+    template = np.column_stack([values[column] for column in columns])
+    template.setflags(write=False)
+    return template
+
+
+class CompactFrames:
+    # Protocols of one window shape kept as their metric and covariate series only, with the
+    # airdrop date as a day offset; the design is rebuilt chunk by chunk from the shared template
+    __slots__ = ('template_columns', 'covariate_columns', 'nobs', 'airdrop_index', 'dtype',
+                 'protocols', 'airdrop_days', 'values', 'covariates')
+
+    def __init__(self, template_columns, covariate_columns, nobs, airdrop_index, float32=False):
+        self.template_columns = ('const',) + tuple(template_columns)
+        self.covariate_columns = list(covariate_columns)
+        self.nobs = nobs
+        self.airdrop_index = airdrop_index
+        self.dtype = np.float32 if float32 else np.float64
+        self.protocols = []
+        self.airdrop_days = []
+        self.values = []
+        self.covariates = []
+
+    def __len__(self):
+        return len(self.protocols)
+
+    def append(self, protocol, df, metric_name, airdrop_date=None):
+        if len(df) != self.nobs:
+            raise ValueError(f"All protocols must have the same number of rows to be stacked, got {len(df)} and {self.nobs}")
+        self.protocols.append(protocol)
+        self.values.append(df[metric_name].to_numpy(dtype=self.dtype))
+        self.covariates.append(df[self.covariate_columns].to_numpy(dtype=self.dtype))
+        if airdrop_date is not None:
+            self.airdrop_days.append((airdrop_date - EPOCH).days)
+
+    @property
+    def exog_names(self):
+        return list(self.template_columns) + self.covariate_columns
+
+    def airdrop_dates(self):
+        return pd.to_datetime(np.array(self.airdrop_days, dtype='datetime64[D]'))
+
+    def chunks(self, chunk_size=CHUNK_SIZE):
+        # (start, stop, design, endog) in float64, one window of protocols at a time
+        template = design_template(self.template_columns, self.nobs, self.airdrop_index)
+        n_template = template.shape[1]
+        for start in range(0, len(self), chunk_size):
+            stop = min(start + chunk_size, len(self))
+            # Each protocol's design is column-major, the layout the stacked data frames had, so
+            # the SVD sees the same input and the fits stay bit-identical
+            X = np.empty((stop - start, n_template + len(self.covariate_columns), self.nobs)).transpose(0, 2, 1)
+            X[:, :, :n_template] = template
+            X[:, :, n_template:] = np.stack(self.covariates[start:stop])
+            yield start, stop, X, np.stack(self.values[start:stop]).astype(float)
+
+
+def result_records(n, columns):
+    # One float64 record per protocol with short field names; the result file columns
+    # (the values of columns) are only attached when the frame is assembled
+    return np.full(n, np.nan, dtype=[(field, 'f8') for field in columns])
+
+
+def records_frame(protocols, records, columns, airdrop_dates=None):
+    frame = pd.DataFrame({'protocol': protocols, **{columns[field]: records[field] for field in records.dtype.names}})
+    if airdrop_dates is not None:
+        frame['airdrop_date'] = airdrop_dates
+    return frame
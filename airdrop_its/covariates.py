@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+from .metrics import count, timer
+
+COVARIATE_FILES = {
+    'MCt': 'market_cap.csv',
+    'Fear_Greed_Index': 'fear_greed_index.csv',
+    'Close': 'sp500.csv'
+}
+
+
+def load_covariate(file_path, column):
+    data = pd.read_csv(file_path)
+    data['Date'] = pd.to_datetime(data['Date'], format='%d/%m/%Y')
+    return data[['Date', column]]
+
+
+# Market covariates aligned once to a dense daily calendar. For every day the store keeps
+# the offset of the last and the next observed day, so the per-protocol ffill/bfill over
+# [first date - 1, last date + 1] reduces to array lookups by day offset.
+class CovariateStore:
+    def __init__(self, series):
+        self.origin = min(data['Date'].min() for data in series.values())
+        end = max(data['Date'].max() for data in series.values())
+        self.length = (end - self.origin).days + 1
+        self.date_ranges = {}
+        self.values = {}
+        self.prev_obs = {}
+        self.next_obs = {}
+
+        days = np.arange(self.length)
+        for column, data in series.items():
+            if data['Date'].duplicated().any():
+                raise ValueError(f"Duplicate dates in {column} covariate data")
+            self.date_ranges[column] = (data['Date'].min(), data['Date'].max())
+
+            observed = data.dropna(subset=[column])
+            values = np.full(self.length, np.nan)
+            values[self.offsets(observed['Date'])] = observed[column].to_numpy(dtype=float)
+            has_obs = ~np.isnan(values)
+
+            # Offset of the last observation on or before each day (-1 if none)
+            prev_obs = np.maximum.accumulate(np.where(has_obs, days, -1))
+            # Offset of the first observation on or after each day (length if none)
+            next_obs = np.minimum.accumulate(np.where(has_obs, days, self.length)[::-1])[::-1]
+
+            self.values[column] = values
+            self.prev_obs[column] = prev_obs
+            self.next_obs[column] = next_obs
+
+    @classmethod
+    def from_arrays(cls, origin, date_ranges, values, prev_obs, next_obs):
+        # Rebuild a store from precomputed (possibly memory-mapped) calendar arrays
+        store = cls.__new__(cls)
+        store.origin = pd.Timestamp(origin)
+        store.length = len(next(iter(values.values())))
+        store.date_ranges = date_ranges
+        store.values = values
+        store.prev_obs = prev_obs
+        store.next_obs = next_obs
+        return store
+
+    @classmethod
+    def from_csv(cls, columns=tuple(COVARIATE_FILES), folder='.'):
+        return cls({column: load_covariate(f"{folder}/{COVARIATE_FILES[column]}", column) for column in columns})
+
+    def offsets(self, dates):
+        return ((pd.DatetimeIndex(dates) - self.origin) // pd.Timedelta(days=1)).to_numpy()
+
+    def window(self, dates, columns):
+        # Same values as reindexing each covariate over [min - 1 day, max + 1 day],
+        # then ffill().bfill() and merging on Date
+        with timer('covariate_align'):
+            offsets = self.offsets(dates)
+            start, end = offsets.min() - 1, offsets.max() + 1
+            inside = np.clip(offsets, 0, self.length - 1)
+
+            aligned = {}
+            for column in columns:
+                prev_obs = np.where(offsets < 0, -1, self.prev_obs[column][inside])
+                next_obs = np.where(offsets >= self.length, self.length, self.next_obs[column][inside])
+                use_prev = (prev_obs >= 0) & (prev_obs >= start)
+                use_next = (next_obs < self.length) & (next_obs <= end)
+                source = np.where(use_prev, prev_obs, np.where(use_next, next_obs, -1))
+                values = self.values[column][np.clip(source, 0, self.length - 1)]
+                aligned[column] = np.where(source >= 0, values, np.nan)
+
+                # Days filled from a neighbouring observation, and days left without a value
+                count('covariate_days', len(offsets), covariate=column)
+                count('covariate_filled_days', int(((source != offsets) & (source >= 0)).sum()), covariate=column)
+                count('covariate_missing_days', int((source < 0).sum()), covariate=column)
+        return aligned
+
+    def fingerprint(self, first_date, last_date, columns):
+        # Raw covariate values over [first_date - 1, last_date + 1], the only days window() reads
+        start = (pd.Timestamp(first_date) - self.origin).days - 1
+        end = (pd.Timestamp(last_date) - self.origin).days + 1
+        lo, hi = max(start, 0), min(end, self.length - 1)
+        parts = []
+        for column in columns:
+            values = np.full(end - start + 1, np.nan)
+            if lo <= hi:
+                values[lo - start:hi - start + 1] = self.values[column][lo:hi + 1]
+            parts.append(values.tobytes())
+        return b''.join(parts)
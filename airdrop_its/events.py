@@ -0,0 +1,174 @@
+import pandas as pd
+import numpy as np
+import os
+import argparse
+from .batch_ols import COV_TYPES, fit_ols_ragged
+from .covariates import CovariateStore
+from .columnar import ColumnarStore, read_protocol
+
+# Covariates of the main specification in analysis.py
+COVARIATE_COLUMNS = ['MCt', 'Close']
+
+# One row per airdrop; a protocol with several airdrop seasons has several rows
+CALENDAR_COLUMNS = ['folder', 'protocol', 'airdrop_date', 'pre_days', 'post_days']
+
+def load_calendar(path):
+    calendar = pd.read_csv(path)
+    missing = [column for column in CALENDAR_COLUMNS if column not in calendar.columns]
+    if missing:
+        raise ValueError(f"Event calendar {path} is missing the columns {missing}")
+    calendar['airdrop_date'] = pd.to_datetime(calendar['airdrop_date'], format='%d/%m/%Y')
+    return calendar.sort_values(['folder', 'protocol', 'airdrop_date']).reset_index(drop=True)
+
+def write_calendar(path, protocol_types, store=None):
+    # Starting calendar with the single airdrop analysis.py assumes for every protocol:
+    # row 30 of the file, with 30 days on each side
+    rows = []
+    for folder, _, _ in protocol_types:
+        if store is not None:
+            file_paths = store.list_files(folder)
+        else:
+            file_paths = [os.path.join(folder, file) for file in os.listdir(folder) if file.endswith('.csv')]
+        for file_path in sorted(file_paths):
+            df = read_protocol(file_path, store).sort_values('Date').reset_index(drop=True)
+            # The protocol column names the file, so dotted names like ether.fi are kept whole
+            rows.append({'folder': folder, 'protocol': os.path.splitext(os.path.basename(file_path))[0],
+                         'airdrop_date': df['Date'].iloc[30].strftime('%d/%m/%Y'), 'pre_days': 30, 'post_days': 30})
+    pd.DataFrame(rows, columns=CALENDAR_COLUMNS).to_csv(path, index=False)
+
+def build_design(df, events, metric_name, covariates):
+    # Multi-regime ITS design over the union of the calendar windows of one protocol: intercept,
+    # pre-trend T (days from the first airdrop), the covariates, then one level change X_k and one
+    # slope change X_k * (days since airdrop k) per airdrop. Days between two windows that belong
+    # to neither are left out. The per-airdrop pairs come last so that designs with fewer airdrops
+    # line up with the widest one once zero-padded.
+    df = df.sort_values('Date').reset_index(drop=True)
+    first_days = events['airdrop_date'] - pd.to_timedelta(events['pre_days'], unit='D')
+    last_days = events['airdrop_date'] + pd.to_timedelta(events['post_days'], unit='D')
+    in_window = np.zeros(len(df), dtype=bool)
+    for first_day, last_day in zip(first_days, last_days):
+        in_window |= ((df['Date'] >= first_day) & (df['Date'] <= last_day)).to_numpy()
+    df = df[in_window].reset_index(drop=True)
+
+    columns = [np.ones(len(df)), (df['Date'] - events['airdrop_date'].iloc[0]).dt.days.to_numpy(dtype=float)]
+    for column, values in covariates.window(df['Date'], COVARIATE_COLUMNS).items():
+        columns.append(values)
+    for airdrop_date in events['airdrop_date']:
+        days_since = (df['Date'] - airdrop_date).dt.days.to_numpy(dtype=float)
+        X = (days_since >= 0).astype(float)
+        columns += [X, X * days_since]
+
+    return np.column_stack(columns), df[metric_name].to_numpy(dtype=float), df
+
+def prepare_events(calendar, protocol_types, covariates, store=None):
+    # Designs of every protocol in the calendar, across all protocol types
+    metrics = {folder: (metric, protocol_type) for folder, metric, protocol_type in protocol_types}
+    entries, designs, endogs = [], [], []
+    for (folder, protocol), events in calendar.groupby(['folder', 'protocol'], sort=False):
+        file_path = os.path.join(folder, f'{protocol}.csv')
+        try:
+            if folder not in metrics:
+                raise ValueError(f"unknown folder '{folder}'")
+            metric, protocol_type = metrics[folder]
+            design, endog, df = build_design(read_protocol(file_path, store), events, metric, covariates)
+            if np.isnan(design).any() or np.isnan(endog).any():
+                raise ValueError("missing covariate or metric values in the event window")
+            # An airdrop without data after it in the window cannot be estimated
+            empty = [str(date.date()) for date in events['airdrop_date'] if not (df['Date'] >= date).any()]
+            if empty:
+                raise ValueError(f"no data from the airdrop dates {empty} on")
+        except Exception as e:
+            print(f"Error processing {file_path}: {str(e)}")
+            continue
+
+        entries.append((protocol_type, protocol, events, df['Date'].min(), df['Date'].max()))
+        designs.append(design)
+        endogs.append(endog)
+
+    return entries, designs, endogs
+
+def fit_events(entries, designs, endogs, cov_type='nonrobust', maxlags=None):
+    # One zero-padded batched OLS solve over the whole calendar
+    airdrops = max(len(events) for _, _, events, _, _ in entries)
+    names = ['const', 'T'] + COVARIATE_COLUMNS + [f'{name}_{k}' for k in range(1, airdrops + 1) for name in ['X', 'X_T']]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        results = fit_ols_ragged(designs, endogs, names)
+        results.apply_robust_cov(cov_type, maxlags)
+    params, pvalues = results.params, results.pvalues
+
+    rows = []
+    for i, (protocol_type, protocol, events, first_date, last_date) in enumerate(entries):
+        for k, event in enumerate(events.itertuples(index=False), start=1):
+            rows.append({
+                'protocol type': protocol_type,
+                'protocol': protocol,
+                'airdrop': k,
+                'airdrop_date': event.airdrop_date,
+                'pre_days': event.pre_days,
+                'post_days': event.post_days,
+                'window start': first_date,
+                'window end': last_date,
+                'nobs': results.nobs[i],
+                'α2 or β2 or γ2 (X)': params[f'X_{k}'][i],
+                'α3 or β3 or γ3 (X*T)': params[f'X_T_{k}'][i],
+                'δ (MCt)': params['MCt'][i],
+                'S&P 500': params['Close'][i],
+                'p_value (X)': pvalues[f'X_{k}'][i],
+                'p_value (X*T)': pvalues[f'X_T_{k}'][i],
+                'p_value (MCt)': pvalues['MCt'][i],
+                'p_value (S&P 500)': pvalues['Close'][i]
+            })
+    return pd.DataFrame(rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ITS models with one level and slope change per airdrop from an event calendar')
+    parser.add_argument('--calendar', default='events.csv', help='event calendar CSV with the columns ' + ', '.join(CALENDAR_COLUMNS) + ' (default: events.csv)')
+    parser.add_argument('--init', action='store_true', help='write a calendar with the single 61-day airdrop window of every protocol and exit')
+    parser.add_argument('--cov-type', choices=COV_TYPES, default='nonrobust', help='covariance of the estimates (default: nonrobust)')
+    parser.add_argument('--maxlags', type=int, default=None, help='Newey-West lags for --cov-type HAC (default: floor(4 (nobs/100)^(2/9)) per protocol)')
+    parser.add_argument('--store', default=None, help='read protocols and covariates from a columnar store built by ingest.py instead of the CSVs')
+    args = parser.parse_args(argv)
+    store = ColumnarStore(args.store) if args.store else None
+
+    # Analyze each protocol type
+    protocol_types = [('TVL', 'TVL', 'DeFi'), ('Volume', 'Volume', 'DEX'), ('DAU', 'DAU', 'SocialFi')]
+
+    if args.init:
+        write_calendar(args.calendar, protocol_types, store)
+        print(f"Event calendar has been written to '{args.calendar}'.")
+        return
+
+    # Load market capitalization and S&P 500 data once
+    covariates = store.covariates(COVARIATE_COLUMNS) if store else CovariateStore.from_csv(COVARIATE_COLUMNS)
+
+    calendar = load_calendar(args.calendar)
+    entries, designs, endogs = prepare_events(calendar, protocol_types, covariates, store)
+    if not entries:
+        print("No protocols in the event calendar could be analysed.")
+        return
+    results = fit_events(entries, designs, endogs, args.cov_type, args.maxlags)
+
+    # Create 'events' folder if it doesn't exist
+    events_folder = 'events'
+    if not os.path.exists(events_folder):
+        os.makedirs(events_folder)
+
+    for _, _, protocol_type in protocol_types:
+        type_results = results[results['protocol type'] == protocol_type]
+        if type_results.empty:
+            continue
+        print(f"\nEvent analysis for {protocol_type}:")
+        print(type_results)
+        for k, airdrop_results in type_results.groupby('airdrop'):
+            print(f"\nAirdrop {k} ({len(airdrop_results)} protocols):")
+            print(f"Average immediate effect: {airdrop_results['α2 or β2 or γ2 (X)'].mean()}")
+            print(f"Average slope change: {airdrop_results['α3 or β3 or γ3 (X*T)'].mean()}")
+            print(f"Protocols with significant immediate effect: {(airdrop_results['p_value (X)'] < 0.05).sum()}/{len(airdrop_results)}")
+            print(f"Protocols with significant slope change: {(airdrop_results['p_value (X*T)'] < 0.05).sum()}/{len(airdrop_results)}")
+
+        type_results.to_csv(os.path.join(events_folder, f'{protocol_type.lower()}_event_results.csv'), index=False)
+
+    print(f"\nEvent results have been saved in the '{events_folder}' folder.")
+
+if __name__ == '__main__':
+    main()
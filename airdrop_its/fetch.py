@@ -0,0 +1,341 @@
+import argparse
+import asyncio
+import calendar
+import csv
+import http.client
+import json
+import os
+import ssl
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from .covariates import COVARIATE_FILES
+from .metrics import add_metrics_arguments, count, quiet, set_quiet, timer, write_metrics
+
+# Default API roots; --base-url NAME=URL points a source somewhere else (a mirror or a
+# local stub server). Sources without a default are skipped unless a URL is given.
+BASE_URLS = {
+    'fear_greed': 'https://api.alternative.me',
+    'sp500': 'https://query1.finance.yahoo.com',
+    'market_cap': None,
+    'defillama_tvl': 'https://api.llama.fi',
+    'defillama_volume': 'https://api.llama.fi',
+    'dau': None
+}
+
+# Source of each covariate file and of each protocol folder's metric
+COVARIATE_SOURCES = {'MCt': 'market_cap', 'Fear_Greed_Index': 'fear_greed', 'Close': 'sp500'}
+METRIC_SOURCES = {'TVL': 'defillama_tvl', 'Volume': 'defillama_volume', 'DAU': 'dau'}
+
+HEADERS = {'User-Agent': 'Mozilla/5.0', 'Accept': 'application/json'}
+RETRIES = 3
+
+
+def fear_greed_url(base_url, name, start, end):
+    # alternative.me only serves the most recent N days (and all of them for limit=0)
+    limit = max((datetime.now().date() - start.date()).days + 1, 1)
+    return f"{base_url}/fng/?limit={limit}&date_format=world"
+
+
+def parse_fear_greed(payload):
+    rows = []
+    for item in payload['data']:
+        if '-' in item['timestamp']:
+            date = datetime.strptime(item['timestamp'], '%d-%m-%Y')
+        else:
+            date = datetime.fromtimestamp(int(item['timestamp']))
+        rows.append((date, int(item['value']), item['value_classification']))
+    return pd.DataFrame(rows, columns=['Date', 'Fear_Greed_Index', 'Classification'])
+
+
+def sp500_url(base_url, name, start, end):
+    period1 = calendar.timegm(start.timetuple())
+    period2 = calendar.timegm((end + timedelta(days=1)).timetuple())
+    return f"{base_url}/v8/finance/chart/%5EGSPC?period1={period1}&period2={period2}&interval=1d"
+
+
+def parse_sp500(payload):
+    # Trading days are stamped at the New York open; the exchange offset gives the local date
+    result = payload['chart']['result'][0]
+    timestamps = np.array(result.get('timestamp', []), dtype='int64') + result['meta'].get('gmtoffset', 0)
+    close = result['indicators']['quote'][0].get('close', []) if len(timestamps) else []
+    return pd.DataFrame({'Date': pd.to_datetime(timestamps, unit='s').normalize(), 'Close': close})
+
+
+def defillama_tvl_url(base_url, name, start, end):
+    # DefiLlama only serves full histories; the rows already stored are dropped after parsing
+    return f"{base_url}/protocol/{urllib.parse.quote(name)}"
+
+
+def parse_defillama_tvl(payload):
+    rows = [(item['date'], item['totalLiquidityUSD']) for item in payload['tvl']]
+    return daily_frame(rows, 'TVL')
+
+
+def defillama_volume_url(base_url, name, start, end):
+    return (f"{base_url}/summary/dexs/{urllib.parse.quote(name)}"
+            "?excludeTotalDataChart=false&excludeTotalDataChartBreakdown=true&dataType=dailyVolume")
+
+
+def parse_defillama_volume(payload):
+    return daily_frame(payload['totalDataChart'], 'Volume')
+
+
+def series_url(base_url, name, start, end):
+    # Plain series endpoint for sources without a public API: GET <base>/<name>?start=&end=
+    # with ISO dates, answered by a JSON list of [unix seconds or ISO date, value] pairs
+    return f"{base_url}/{urllib.parse.quote(name)}?start={start:%Y-%m-%d}&end={end:%Y-%m-%d}"
+
+
+def parse_series(column):
+    def parse(payload):
+        return daily_frame(payload, column)
+    return parse
+
+
+def daily_frame(rows, column):
+    frame = pd.DataFrame(list(rows), columns=['Date', column])
+    if pd.api.types.is_numeric_dtype(frame['Date']):
+        frame['Date'] = pd.to_datetime(frame['Date'], unit='s')
+    else:
+        frame['Date'] = pd.to_datetime(frame['Date'])
+    frame['Date'] = frame['Date'].dt.normalize()
+    return frame
+
+
+# Request URL builder and payload parser of each source
+SOURCES = {
+    'fear_greed': (fear_greed_url, parse_fear_greed),
+    'sp500': (sp500_url, parse_sp500),
+    'market_cap': (series_url, parse_series('MCt')),
+    'defillama_tvl': (defillama_tvl_url, parse_defillama_tvl),
+    'defillama_volume': (defillama_volume_url, parse_defillama_volume),
+    'dau': (series_url, parse_series('DAU'))
+}
+
+
+class ConnectionPool:
+    # One keep-alive connection per host and worker thread, so the requests a thread makes
+    # to the same host reuse one TCP (and TLS) connection
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+        self.context = ssl.create_default_context()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.opened = 0
+
+    def connection(self, scheme, netloc):
+        connections = self.local.__dict__.setdefault('connections', {})
+        if (scheme, netloc) not in connections:
+            if scheme == 'https':
+                connections[scheme, netloc] = http.client.HTTPSConnection(netloc, timeout=self.timeout,
+                                                                          context=self.context)
+            else:
+                connections[scheme, netloc] = http.client.HTTPConnection(netloc, timeout=self.timeout)
+            with self.lock:
+                self.opened += 1
+        return connections[scheme, netloc]
+
+    def discard(self, scheme, netloc):
+        self.local.connections.pop((scheme, netloc)).close()
+
+    def get_json(self, url):
+        parts = urllib.parse.urlsplit(url)
+        target = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        for attempt in range(RETRIES):
+            connection = self.connection(parts.scheme, parts.netloc)
+            try:
+                connection.request('GET', target, headers=HEADERS)
+                response = connection.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError):
+                # The server may have closed an idle keep-alive connection; reconnect
+                self.discard(parts.scheme, parts.netloc)
+                if attempt == RETRIES - 1:
+                    raise
+                continue
+            if response.will_close:
+                self.discard(parts.scheme, parts.netloc)
+            if (response.status == 429 or response.status >= 500) and attempt < RETRIES - 1:
+                time.sleep(2 ** attempt)
+                continue
+            if response.status != 200:
+                raise RuntimeError(f"GET {url} returned HTTP {response.status}")
+            return json.loads(body)
+
+
+def last_date(file_path):
+    # Last day stored in an analysis CSV, or None if the file does not exist yet
+    if not os.path.exists(file_path):
+        return None
+    dates = pd.read_csv(file_path, usecols=['Date'])['Date']
+    if dates.empty:
+        return None
+    return pd.to_datetime(dates, format='%d/%m/%Y').max()
+
+
+def plan_jobs(targets, base_urls, start, end):
+    # One request per file for the days after its last stored row; files that are up to date
+    # and sources without a base URL need no request
+    jobs, skipped = [], []
+    for source, name, file_path, columns in targets:
+        if base_urls.get(source) is None:
+            skipped.append((file_path, f"no base URL for {source} (pass --base-url {source}=URL)"))
+            continue
+        stored = last_date(file_path)
+        first = start if stored is None else stored + timedelta(days=1)
+        if first > end:
+            skipped.append((file_path, "up to date"))
+            continue
+        make_url, parse = SOURCES[source]
+        jobs.append({'file_path': file_path, 'columns': columns, 'start': first, 'end': end,
+                     'url': make_url(base_urls[source].rstrip('/'), name, first, end), 'parse': parse})
+    return jobs, skipped
+
+
+async def fetch_jobs(jobs, concurrency=8, timeout=30):
+    # All requests are in flight at once, at most `concurrency` of them on the wire; the pool's
+    # worker threads keep their connections open across requests
+    pool = ConnectionPool(timeout)
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        async def fetch(job):
+            try:
+                return await loop.run_in_executor(executor, pool.get_json, job['url']), None
+            except Exception as e:
+                return None, e
+
+        payloads = await asyncio.gather(*(fetch(job) for job in jobs))
+    return payloads, pool.opened
+
+
+def new_rows(job, payload):
+    # Parsed rows inside the missing range, one per day, in the file's column order
+    frame = job['parse'](payload)
+    frame = frame[(frame['Date'] >= job['start']) & (frame['Date'] <= job['end'])]
+    frame = frame.drop_duplicates('Date', keep='last').sort_values('Date')
+    return frame[['Date'] + job['columns']]
+
+
+def format_value(value):
+    # Same number formatting as the stored files: whole numbers without a decimal point
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ''
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def append_rows(file_path, columns, frame):
+    # Append in the analysis format (dd/mm/yyyy dates) without rewriting the stored rows
+    exists = os.path.exists(file_path)
+    if exists and os.path.getsize(file_path) > 0:
+        with open(file_path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b'\n'
+    else:
+        needs_newline = False
+    with open(file_path, 'a', newline='') as f:
+        if needs_newline:
+            f.write('\n')
+        writer = csv.writer(f, lineterminator='\n')
+        if not exists:
+            writer.writerow(['Date'] + columns)
+        for row in frame.itertuples(index=False):
+            writer.writerow([row[0].strftime('%d/%m/%Y')] + [format_value(value) for value in row[1:]])
+
+
+def covariate_targets():
+    targets = []
+    for column, file_path in COVARIATE_FILES.items():
+        columns = ['Fear_Greed_Index', 'Classification'] if column == 'Fear_Greed_Index' else [column]
+        targets.append((COVARIATE_SOURCES[column], column, file_path, columns))
+    return targets
+
+
+def protocol_targets(protocol_types):
+    targets = []
+    for folder, metric, _ in protocol_types:
+        for file in sorted(os.listdir(folder)):
+            if file.endswith('.csv'):
+                # The file name (without .csv) is the protocol's slug at the source
+                targets.append((METRIC_SOURCES[metric], os.path.splitext(file)[0], os.path.join(folder, file), [metric]))
+    return targets
+
+
+def parse_base_urls(values):
+    base_urls = dict(BASE_URLS)
+    for value in values:
+        name, sep, url = value.partition('=')
+        if not sep or name not in SOURCES:
+            raise ValueError(f"--base-url expects NAME=URL with NAME one of {', '.join(SOURCES)}, got '{value}'")
+        base_urls[name] = url
+    return base_urls
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fetch the days missing from the covariate (and protocol) CSVs concurrently')
+    parser.add_argument('--protocols', action='store_true', help='also extend the protocol files in TVL, Volume and DAU (for streaming.py and events.py; analysis.py expects the 61-day windows)')
+    parser.add_argument('--start', default='01/01/2023', help='first day to fetch for files that do not exist yet, dd/mm/yyyy (default: 01/01/2023)')
+    parser.add_argument('--end', default=None, help='last day to fetch, dd/mm/yyyy (default: yesterday)')
+    parser.add_argument('--base-url', action='append', default=[], metavar='NAME=URL', help='API root of a source (' + ', '.join(SOURCES) + '); repeatable')
+    parser.add_argument('--concurrency', type=int, default=8, help='number of requests on the wire at once (default: 8)')
+    parser.add_argument('--timeout', type=float, default=30, help='per-request timeout in seconds (default: 30)')
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+    set_quiet(args.quiet)
+    base_urls = parse_base_urls(args.base_url)
+
+    start = datetime.strptime(args.start, '%d/%m/%Y')
+    if args.end:
+        end = datetime.strptime(args.end, '%d/%m/%Y')
+    else:
+        # Today's values are not final yet
+        end = datetime.combine(datetime.now().date(), datetime.min.time()) - timedelta(days=1)
+
+    # Protocol types whose files can be extended
+    protocol_types = [('TVL', 'TVL', 'DeFi'), ('Volume', 'Volume', 'DEX'), ('DAU', 'DAU', 'SocialFi')]
+
+    targets = covariate_targets()
+    if args.protocols:
+        targets += protocol_targets(protocol_types)
+    jobs, skipped = plan_jobs(targets, base_urls, start, end)
+    for file_path, reason in skipped:
+        if not quiet():
+            print(f"{file_path}: {reason}")
+
+    with timer('fetch'):
+        payloads, connections = asyncio.run(fetch_jobs(jobs, args.concurrency, args.timeout))
+    count('requests', len(jobs))
+    print(f"\n{len(jobs)} requests, {connections} connections opened.")
+
+    added = 0
+    with timer('write'):
+        for job, (payload, error) in zip(jobs, payloads):
+            if error is not None:
+                count('failures', model='fetch')
+                print(f"Error fetching {job['file_path']}: {str(error)}")
+                continue
+            try:
+                rows = new_rows(job, payload)
+            except Exception as e:
+                count('failures', model='fetch')
+                print(f"Error parsing the response for {job['file_path']}: {str(e)}")
+                continue
+            append_rows(job['file_path'], job['columns'], rows)
+            added += len(rows)
+            print(f"{job['file_path']}: {len(rows)} new rows ({job['start']:%d/%m/%Y} to {job['end']:%d/%m/%Y})")
+    count('rows_added', added)
+
+    print(f"\n{added} rows have been added. Run ingest.py again if you read the data from a columnar store.")
+    write_metrics(args, 'fetch')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .metrics import count, timer
+
+# Rows go in through executemany in batches of this size
+INSERT_BATCH = 100_000
+
+# One row per run, spec, protocol type, protocol and result column. The table is clustered
+# on (category, column_name, spec_id, run_id, protocol), so one column of one protocol type
+# over many runs is a single range scan; results_by_run serves the lookups of one run.
+# Results are append-only: rows are never updated or deleted.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started TEXT NOT NULL,
+    script TEXT NOT NULL,
+    argv TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS specs (
+    spec_id INTEGER PRIMARY KEY,
+    model TEXT NOT NULL,
+    spec TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS result_sets (
+    run_id INTEGER NOT NULL REFERENCES runs,
+    spec_id INTEGER NOT NULL REFERENCES specs,
+    category TEXT NOT NULL,
+    protocols INTEGER NOT NULL,
+    PRIMARY KEY (run_id, spec_id, category)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL,
+    spec_id INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    protocol TEXT NOT NULL,
+    column_name TEXT NOT NULL,
+    value,
+    PRIMARY KEY (category, column_name, spec_id, run_id, protocol)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_by_run ON results (run_id, category, protocol, spec_id);
+CREATE INDEX IF NOT EXISTS result_sets_by_category ON result_sets (category, spec_id, run_id);
+CREATE TRIGGER IF NOT EXISTS results_no_update BEFORE UPDATE ON results
+    BEGIN SELECT RAISE(ABORT, 'results are append-only'); END;
+CREATE TRIGGER IF NOT EXISTS results_no_delete BEFORE DELETE ON results
+    BEGIN SELECT RAISE(ABORT, 'results are append-only'); END;
+"""
+
+
+def sql_values(series):
+    # Result column as SQLite values: floats, ISO dates or text, with NULL for missing values
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return [None if pd.isna(value) else value.strftime('%Y-%m-%d') for value in series]
+    if pd.api.types.is_numeric_dtype(series):
+        values = series.to_numpy(dtype=float)
+        return [None if np.isnan(value) else value for value in values.tolist()]
+    return [None if pd.isna(value) else value for value in series]
+
+
+# Run history of the result files in one SQLite database. A run (one invocation of a
+# script) is only registered once it appends its first result set.
+class ResultHistory:
+    def __init__(self, path='history.sqlite', script=None, argv=None):
+        self.path = path
+        self.script = script
+        self.argv = sys.argv[1:] if argv is None else list(argv)
+        self.run_id = None
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def spec_id(self, model, spec):
+        self.connection.execute('INSERT OR IGNORE INTO specs (model, spec) VALUES (?, ?)', (model, spec))
+        return self.connection.execute('SELECT spec_id FROM specs WHERE spec = ?', (spec,)).fetchone()[0]
+
+    def append(self, model, category, spec, results):
+        # results: the frame written to the result file, one row per protocol
+        if results.empty:
+            return
+        # Protocol labels are the file names up to the first dot, so two files can share one;
+        # the history keys results by label and cannot tell them apart
+        duplicated = results['protocol'][results['protocol'].duplicated()].astype(str).unique()
+        if len(duplicated):
+            print(f"Not recording {model} results for {category} in the history: "
+                  f"duplicate protocol labels {', '.join(duplicated)}")
+            return
+        with timer('history'), self.connection:
+            if self.run_id is None:
+                self.run_id = self.connection.execute(
+                    'INSERT INTO runs (started, script, argv) VALUES (?, ?, ?)',
+                    (datetime.now().isoformat(timespec='seconds'), self.script or model, json.dumps(self.argv))).lastrowid
+            spec_id = self.spec_id(model, spec)
+            protocols = results['protocol'].astype(str).tolist()
+            self.connection.execute('INSERT INTO result_sets VALUES (?, ?, ?, ?)',
+                                    (self.run_id, spec_id, category, len(protocols)))
+
+            rows = []
+            for column in results.columns.drop('protocol'):
+                rows.extend(zip([self.run_id] * len(protocols), [spec_id] * len(protocols), [category] * len(protocols),
+                                protocols, [column] * len(protocols), sql_values(results[column])))
+            for start in range(0, len(rows), INSERT_BATCH):
+                self.connection.executemany('INSERT INTO results VALUES (?, ?, ?, ?, ?, ?)',
+                                            rows[start:start + INSERT_BATCH])
+        count('history_rows', len(rows))
+
+    def query(self, model, category, column, last=50, protocols=None, spec=None):
+        # One result column of one protocol type over the last runs of a model, long format
+        spec_filter = 'specs.model = ?' + (' AND specs.spec LIKE ?' if spec else '')
+        params = [model] + ([f'%{spec}%'] if spec else [])
+        spec_ids = [row[0] for row in self.connection.execute(f'SELECT spec_id FROM specs WHERE {spec_filter}', params)]
+        if not spec_ids:
+            return pd.DataFrame(columns=['run_id', 'started', 'spec', 'protocol', 'value'])
+
+        marks = ','.join('?' * len(spec_ids))
+        run_ids = [row[0] for row in self.connection.execute(
+            f'SELECT DISTINCT run_id FROM result_sets WHERE category = ? AND spec_id IN ({marks}) '
+            'ORDER BY run_id DESC LIMIT ?', [category] + spec_ids + [last])]
+        if not run_ids:
+            return pd.DataFrame(columns=['run_id', 'started', 'spec', 'protocol', 'value'])
+
+        sql = (f'SELECT run_id, spec_id, protocol, value FROM results '
+               f'WHERE category = ? AND column_name = ? AND spec_id IN ({marks}) AND run_id >= ?')
+        params = [category, column] + spec_ids + [min(run_ids)]
+        if protocols:
+            sql += f" AND protocol IN ({','.join('?' * len(protocols))})"
+            params += list(protocols)
+        frame = pd.DataFrame(self.connection.execute(sql, params).fetchall(),
+                             columns=['run_id', 'spec_id', 'protocol', 'value'])
+        frame = frame[frame['run_id'].isin(run_ids)]
+
+        # Run dates and spec texts are joined on the few distinct ids only
+        started = dict(self.connection.execute(
+            f"SELECT run_id, started FROM runs WHERE run_id IN ({','.join('?' * len(run_ids))})", run_ids))
+        specs = dict(self.connection.execute(f'SELECT spec_id, spec FROM specs WHERE spec_id IN ({marks})', spec_ids))
+        frame.insert(1, 'started', frame['run_id'].map(started))
+        frame['spec_id'] = frame['spec_id'].map(specs)
+        frame = frame.rename(columns={'spec_id': 'spec'})[['run_id', 'started', 'spec', 'protocol', 'value']]
+        return frame.sort_values(['run_id', 'protocol']).reset_index(drop=True)
+
+    def runs(self, last=50):
+        return pd.read_sql_query(
+            'SELECT runs.run_id, runs.started, runs.script, runs.argv, specs.model, result_sets.category, '
+            'result_sets.protocols, specs.spec FROM runs JOIN result_sets USING (run_id) JOIN specs USING (spec_id) '
+            'WHERE runs.run_id IN (SELECT run_id FROM runs ORDER BY run_id DESC LIMIT ?) '
+            'ORDER BY runs.run_id, specs.model, result_sets.category', self.connection, params=[last])
+
+
+def add_history_arguments(parser):
+    parser.add_argument('--history', default='history.sqlite', help='SQLite database the results of every run are appended to (default: history.sqlite)')
+    parser.add_argument('--no-history', action='store_true', help='do not record this run in the history database')
+
+
+def history_from_args(args, script):
+    if args.no_history:
+        return None
+    return ResultHistory(args.history, script)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Query the run history of the result files')
+    parser.add_argument('--history', default='history.sqlite', help='history database written by the analysis scripts (default: history.sqlite)')
+    parser.add_argument('--model', choices=['analysis', 'posterior', 'robustness'], default='analysis', help='result files to query (default: analysis)')
+    parser.add_argument('--category', default='DeFi', help='protocol type: DeFi, DEX or SocialFi (default: DeFi)')
+    parser.add_argument('--column', default='α2 or β2 or γ2 (X)', help="result file column (default: 'α2 or β2 or γ2 (X)')")
+    parser.add_argument('--protocol', action='append', default=None, help='only this protocol; repeatable (default: all)')
+    parser.add_argument('--spec', default=None, help='only specs containing this text, e.g. HC3')
+    parser.add_argument('--last', type=int, default=50, help='number of most recent runs (default: 50)')
+    parser.add_argument('--runs', action='store_true', help='list the recorded runs instead')
+    parser.add_argument('--output', default=None, help='write the protocol x run table to this CSV instead of printing it')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.history):
+        print(f"No history database at '{args.history}'.")
+        return
+    history = ResultHistory(args.history)
+
+    if args.runs:
+        print(history.runs(args.last).to_string(index=False))
+        history.close()
+        return
+
+    with timer('query'):
+        results = history.query(args.model, args.category, args.column, args.last, args.protocol, args.spec)
+    history.close()
+    if results.empty:
+        print(f"No {args.model} results for {args.category} in '{args.history}'.")
+        return
+
+    # Protocols as rows, runs as columns
+    table = results.pivot(index='protocol', columns='run_id', values='value')
+    if args.output:
+        table.to_csv(args.output)
+        print(f"{args.column} for {table.shape[0]} protocols over {table.shape[1]} runs has been saved to '{args.output}'.")
+    else:
+        print(f"{args.column} ({args.model}, {args.category}) over the last {table.shape[1]} runs:")
+        print(table)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import pandas as pd
+import numpy as np
+import os
+import argparse
+import json
+import shutil
+from .covariates import COVARIATE_FILES, CovariateStore
+from .columnar import INDEX_FILE
+
+def read_validated_csv(file_path, columns, exact):
+    # Parse one CSV once, with the checks every analysis run used to rely on implicitly.
+    # Returns the frame, a list of errors and a list of warnings.
+    errors, warnings = [], []
+    with open(file_path, 'rb') as f:
+        if f.read(3) == b'\xef\xbb\xbf':
+            warnings.append("UTF-8 byte order mark stripped")
+
+    df = pd.read_csv(file_path, encoding='utf-8-sig')
+    if (list(df.columns) != columns) if exact else not set(columns) <= set(df.columns):
+        errors.append(f"expected columns {columns}, got {list(df.columns)}")
+        return df, errors, warnings
+
+    try:
+        df['Date'] = pd.to_datetime(df['Date'], format='%d/%m/%Y')
+    except ValueError as e:
+        errors.append(f"unparseable date: {e}")
+        return df, errors, warnings
+
+    values = pd.to_numeric(df[columns[1]], errors='coerce')
+    if values.isna().any():
+        warnings.append(f"{values.isna().sum()} missing or non-numeric {columns[1]} values")
+    df[columns[1]] = values.astype(float)
+
+    duplicated = df['Date'][df['Date'].duplicated()]
+    if len(duplicated):
+        errors.append(f"duplicate dates: {', '.join(duplicated.dt.strftime('%d/%m/%Y'))}")
+    if not df['Date'].is_monotonic_increasing:
+        warnings.append("dates are not sorted")
+    # Covariates are gap-filled by design (weekends, every-other-day market cap)
+    gaps = int((df['Date'].sort_values().diff().dt.days > 1).sum())
+    if gaps and exact:
+        warnings.append(f"{gaps} gap(s) in the daily series")
+
+    return df, errors, warnings
+
+def report(file_path, errors, warnings):
+    for message in errors:
+        print(f"ERROR   {file_path}: {message}")
+    for message in warnings:
+        print(f"warning {file_path}: {message}")
+
+def ingest(protocol_types, output_folder):
+    failed = False
+
+    covariate_frames = {}
+    for column, file_name in COVARIATE_FILES.items():
+        df, errors, warnings = read_validated_csv(file_name, ['Date', column], exact=False)
+        report(file_name, errors, warnings)
+        failed |= bool(errors)
+        covariate_frames[column] = df
+
+    protocols, frames = [], []
+    for folder, metric, protocol_type in protocol_types:
+        for file in os.listdir(folder):
+            if file.endswith('.csv'):
+                file_path = os.path.join(folder, file)
+                df, errors, warnings = read_validated_csv(file_path, ['Date', metric], exact=True)
+                report(file_path, errors, warnings)
+                failed |= bool(errors)
+                protocols.append({'folder': folder, 'file': file, 'metric': metric, 'length': len(df),
+                                  'gaps': sum('gap' in message for message in warnings)})
+                frames.append(df)
+
+    if failed:
+        raise SystemExit("Ingest aborted, fix the errors above")
+
+    # One calendar for protocols and covariates; rows keep their source order
+    origin = min([df['Date'].min() for df in frames] + [df['Date'].min() for df in covariate_frames.values()])
+    last = max([df['Date'].max() for df in frames] + [df['Date'].max() for df in covariate_frames.values()])
+    start = 0
+    for entry, df in zip(protocols, frames):
+        entry['start'] = start
+        start += len(df)
+    values = np.concatenate([df[entry['metric']].to_numpy(dtype=float) for entry, df in zip(protocols, frames)])
+    days = np.concatenate([((df['Date'] - origin).dt.days).to_numpy(dtype=np.int32) for df in frames])
+
+    # Pad the covariates to the full calendar so lookups never leave the arrays
+    padding = pd.DataFrame({'Date': [origin, last]})
+    covariates = CovariateStore({column: pd.concat([df[['Date', column]], padding[~padding['Date'].isin(df['Date'])]])
+                                 for column, df in covariate_frames.items()})
+
+    # Write to a sibling temporary folder and swap it in, so readers never see a partial store
+    tmp_folder = f"{output_folder}.tmp"
+    shutil.rmtree(tmp_folder, ignore_errors=True)
+    os.makedirs(os.path.join(tmp_folder, 'covariates'))
+    np.save(os.path.join(tmp_folder, 'values.npy'), values)
+    np.save(os.path.join(tmp_folder, 'days.npy'), days)
+    for column in covariate_frames:
+        np.save(os.path.join(tmp_folder, 'covariates', f'{column}.values.npy'), covariates.values[column])
+        np.save(os.path.join(tmp_folder, 'covariates', f'{column}.prev.npy'), covariates.prev_obs[column])
+        np.save(os.path.join(tmp_folder, 'covariates', f'{column}.next.npy'), covariates.next_obs[column])
+
+    index = {
+        'origin': origin.strftime('%Y-%m-%d'),
+        'protocols': protocols,
+        'covariates': {column: {'file': COVARIATE_FILES[column],
+                                'first': df['Date'].min().strftime('%Y-%m-%d'),
+                                'last': df['Date'].max().strftime('%Y-%m-%d')}
+                       for column, df in covariate_frames.items()}
+    }
+    with open(os.path.join(tmp_folder, INDEX_FILE), 'w') as f:
+        json.dump(index, f, indent=1)
+
+    # The old store is renamed aside and only deleted once the new one is in place, so a crash
+    # at any point leaves a complete store under output_folder or output_folder.old
+    old_folder = f"{output_folder}.old"
+    if os.path.exists(output_folder):
+        shutil.rmtree(old_folder, ignore_errors=True)
+        os.replace(output_folder, old_folder)
+    os.replace(tmp_folder, output_folder)
+    shutil.rmtree(old_folder, ignore_errors=True)
+    return index
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compile the protocol and covariate CSVs into a memory-mapped columnar store')
+    parser.add_argument('--output', default='store', help="store folder (default: store)")
+    args = parser.parse_args(argv)
+
+    protocol_types = [('TVL', 'TVL', 'DeFi'), ('Volume', 'Volume', 'DEX'), ('DAU', 'DAU', 'SocialFi')]
+    index = ingest(protocol_types, args.output)
+
+    print(f"\nIngested {len(index['protocols'])} protocols and {len(index['covariates'])} covariates into '{args.output}'.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Stage timers and event counters of the current process. Worker processes send their
+# snapshot back with every chunk, so the parent reports totals summed over all workers.
+_timers = {}
+_counters = {}
+_started = time.perf_counter()
+
+# Quiet mode skips the per-protocol progress output and DataFrame printing
+QUIET = False
+
+
+def set_quiet(quiet):
+    global QUIET
+    QUIET = quiet
+
+
+def quiet():
+    return QUIET
+
+
+@contextmanager
+def timer(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds, calls = _timers.get(stage, (0.0, 0))
+        _timers[stage] = (seconds + time.perf_counter() - start, calls + 1)
+
+
+def count(name, value=1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    _counters[key] = _counters.get(key, 0) + value
+
+
+def snapshot(reset=False):
+    global _timers, _counters
+    state = {'timers': dict(_timers), 'counters': dict(_counters)}
+    if reset:
+        _timers, _counters = {}, {}
+    return state
+
+
+def merge(state):
+    for stage, (seconds, calls) in state['timers'].items():
+        total_seconds, total_calls = _timers.get(stage, (0.0, 0))
+        _timers[stage] = (total_seconds + seconds, total_calls + calls)
+    for key, value in state['counters'].items():
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def fill_ratios():
+    # Share of covariate values taken from a neighbouring day, per covariate
+    days = {dict(labels)['covariate']: value for (name, labels), value in _counters.items() if name == 'covariate_days'}
+    filled = {dict(labels)['covariate']: value for (name, labels), value in _counters.items() if name == 'covariate_filled_days'}
+    return {column: filled.get(column, 0) / total for column, total in days.items() if total}
+
+
+def to_jsonl(script):
+    timestamp = datetime.now().isoformat(timespec='seconds')
+    records = [{'time': timestamp, 'script': script, 'type': 'timer', 'name': stage, 'seconds': seconds, 'calls': calls}
+               for stage, (seconds, calls) in _timers.items()]
+    records += [{'time': timestamp, 'script': script, 'type': 'counter', 'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in _counters.items()]
+    records += [{'time': timestamp, 'script': script, 'type': 'gauge', 'name': 'covariate_fill_ratio',
+                 'labels': {'covariate': column}, 'value': ratio} for column, ratio in fill_ratios().items()]
+    records.append({'time': timestamp, 'script': script, 'type': 'gauge', 'name': 'run_seconds',
+                    'value': time.perf_counter() - _started})
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+
+def _prometheus_labels(labels):
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+def to_prometheus(script):
+    script_label = (('script', script),)
+    lines = ['# TYPE airdrop_stage_seconds_total counter']
+    lines += [f'airdrop_stage_seconds_total{_prometheus_labels(script_label + (("stage", stage),))} {seconds}'
+              for stage, (seconds, _) in _timers.items()]
+    lines.append('# TYPE airdrop_stage_calls_total counter')
+    lines += [f'airdrop_stage_calls_total{_prometheus_labels(script_label + (("stage", stage),))} {calls}'
+              for stage, (_, calls) in _timers.items()]
+    for name in sorted({name for name, _ in _counters}):
+        lines.append(f'# TYPE airdrop_{name}_total counter')
+        lines += [f'airdrop_{name}_total{_prometheus_labels(script_label + labels)} {value}'
+                  for (counter, labels), value in _counters.items() if counter == name]
+    lines.append('# TYPE airdrop_covariate_fill_ratio gauge')
+    lines += [f'airdrop_covariate_fill_ratio{_prometheus_labels(script_label + (("covariate", column),))} {ratio}'
+              for column, ratio in fill_ratios().items()]
+    lines.append('# TYPE airdrop_run_seconds gauge')
+    lines.append(f'airdrop_run_seconds{_prometheus_labels(script_label)} {time.perf_counter() - _started}')
+    return '\n'.join(lines) + '\n'
+
+
+def add_metrics_arguments(parser):
+    parser.add_argument('--quiet', action='store_true', help='skip the per-protocol progress output and DataFrame printing')
+    parser.add_argument('--metrics', default=None, help="write stage timings and counters to this file ('-' for stdout)")
+    parser.add_argument('--metrics-format', choices=['jsonl', 'prometheus'], default='jsonl',
+                        help='JSON lines appended per run, or Prometheus text format (default: jsonl)')
+
+
+def write_metrics(args, script):
+    if args.metrics is None:
+        return
+    text = to_jsonl(script) if args.metrics_format == 'jsonl' else to_prometheus(script)
+    if args.metrics == '-':
+        sys.stdout.write(text)
+        return
+    if args.metrics_format == 'jsonl':
+        with open(args.metrics, 'a') as f:
+            f.write(text)
+    else:
+        # Replaced atomically, as expected by the node exporter's textfile collector
+        tmp_path = f'{args.metrics}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, args.metrics)
@@ -0,0 +1,151 @@
+import pandas as pd
+import numpy as np
+import os
+import argparse
+from . import posterior
+from .covariates import CovariateStore
+from .columnar import ColumnarStore, read_protocol
+
+COVARIATE_COLUMNS = ['MCt', 'Fear_Greed_Index', 'Close']
+EFFECTS = ['shared', 'protocol']
+SCALES = ['level', 'relative']
+
+def load_panel(folder_path, metric_name, covariates, scale, store=None):
+    # Stack the protocols of one folder into a long frame sorted by protocol
+    if store is not None:
+        file_paths = store.list_files(folder_path)
+    else:
+        file_paths = [os.path.join(folder_path, file) for file in os.listdir(folder_path) if file.endswith('.csv')]
+
+    frames = []
+    for file_path in file_paths:
+        df, _ = posterior.build_frame(read_protocol(file_path, store), covariates)
+        if scale == 'relative':
+            # Effects as shares of the protocol's pre-airdrop mean, so large protocols do not dominate
+            df[metric_name] = df[metric_name] / df.loc[df['X'] == 0, metric_name].mean()
+        df['protocol'] = os.path.basename(file_path).split('.')[0]
+        frames.append(df)
+
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+def group_sums(a, starts):
+    # Per-protocol sums over the leading axis; rows of a protocol are contiguous
+    return np.add.reduceat(a, starts, axis=0)
+
+def fit_panel(panel, metric_name, effects):
+    # Pooled ITS with protocol fixed effects. Per-protocol columns Z (intercept, plus X and X*T
+    # when the effects are protocol-specific) are absorbed protocol by protocol (Frisch-Waugh-Lovell),
+    # so the only dense solve is over the few shared columns W; no nobs x protocols design is built.
+    from scipy import special
+    shared = ['T'] + (['X', 'X_T'] if effects == 'shared' else []) + COVARIATE_COLUMNS
+    protocols, starts, sizes = np.unique(panel['protocol'].to_numpy(), return_index=True, return_counts=True)
+    order = np.argsort(starts)
+    protocols, starts, sizes = protocols[order], starts[order], sizes[order]
+    group = np.repeat(np.arange(len(protocols)), sizes)
+
+    y = panel[metric_name].to_numpy(dtype=float)
+    W = panel[shared].to_numpy(dtype=float)
+    Z = np.ones((len(panel), 1)) if effects == 'shared' else np.column_stack(
+        [np.ones(len(panel)), panel[['X', 'X_T']].to_numpy(dtype=float)])
+
+    # Per-protocol projection coefficients of W and y on Z
+    zz = group_sums(Z[:, :, np.newaxis] * Z[:, np.newaxis, :], starts)
+    zz_inv = np.linalg.pinv(zz, hermitian=True)
+    gamma_w = zz_inv @ group_sums(Z[:, :, np.newaxis] * W[:, np.newaxis, :], starts)
+    gamma_y = (zz_inv @ group_sums(Z * y[:, np.newaxis], starts)[:, :, np.newaxis])[:, :, 0]
+    W_tilde = W - np.einsum('nj,njk->nk', Z, gamma_w[group])
+    y_tilde = y - np.einsum('nj,nj->n', Z, gamma_y[group])
+
+    # Shared coefficients from the absorbed regression; columns are scaled to unit norm
+    # first, as market capitalization is ~1e12 next to 0/1 indicators
+    norms = np.linalg.norm(W_tilde, axis=0)
+    norms[norms == 0] = 1.0
+    B = np.linalg.pinv(W_tilde / norms) / norms[:, np.newaxis]
+    beta = B @ y_tilde
+    resid = y_tilde - W_tilde @ beta
+    xtx_inv = B @ B.T
+
+    nobs, n_groups = len(y), len(protocols)
+    n_params = len(shared) + n_groups * Z.shape[1]
+    df_resid = nobs - n_params
+    sigma2 = resid @ resid / df_resid
+
+    # Cluster-robust (CR1) covariance by protocol, with the usual finite-sample factor
+    scores = group_sums(B.T * resid[:, np.newaxis], starts)
+    correction = n_groups / (n_groups - 1) * (nobs - 1) / df_resid
+    cov_cluster = correction * scores.T @ scores
+    bse_cluster = np.sqrt(np.diag(cov_cluster))
+    bse = np.sqrt(np.diag(xtx_inv) * sigma2)
+
+    rows = []
+    for k, term in enumerate(shared):
+        rows.append({
+            'term': term, 'protocol': '', 'coefficient': beta[k],
+            'std error (clustered)': bse_cluster[k],
+            'p_value (clustered)': special.stdtr(n_groups - 1, -abs(beta[k] / bse_cluster[k])) * 2,
+            'std error': bse[k],
+            'p_value': special.stdtr(df_resid, -abs(beta[k] / bse[k])) * 2
+        })
+
+    if effects == 'protocol':
+        # Protocol-specific level and slope changes: delta_i = gamma_y - gamma_w beta, with the
+        # partitioned-inverse variance sigma^2 [(Z_i'Z_i)^-1 + gamma_w (W~'W~)^-1 gamma_w'].
+        # The clustered variance of a protocol's own effect is not reported: its residuals are
+        # orthogonal to its own columns, so that protocol adds nothing to the meat.
+        delta = gamma_y - gamma_w @ beta
+        cov_delta = sigma2 * (zz_inv + gamma_w @ xtx_inv @ np.swapaxes(gamma_w, -1, -2))
+        bse_delta = np.sqrt(np.diagonal(cov_delta, axis1=1, axis2=2))
+        for i, protocol in enumerate(protocols):
+            for k, term in [(1, 'X'), (2, 'X_T')]:
+                rows.append({
+                    'term': term, 'protocol': protocol, 'coefficient': delta[i, k],
+                    'std error (clustered)': np.nan, 'p_value (clustered)': np.nan,
+                    'std error': bse_delta[i, k],
+                    'p_value': special.stdtr(df_resid, -abs(delta[i, k] / bse_delta[i, k])) * 2
+                })
+
+    return pd.DataFrame(rows), {'nobs': nobs, 'protocols': n_groups, 'df_resid': df_resid,
+                                'r2_within': 1 - resid @ resid / (y_tilde @ y_tilde)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pooled panel ITS model with protocol fixed effects per protocol type')
+    parser.add_argument('--effects', choices=EFFECTS, default='shared', help='one X and X*T effect per protocol type, or one per protocol (default: shared)')
+    parser.add_argument('--scale', choices=SCALES, default='level', help='fit the metric in levels, or relative to each protocol\'s pre-airdrop mean (default: level)')
+    parser.add_argument('--store', default=None, help='read protocols and covariates from a columnar store built by ingest.py instead of the CSVs')
+    args = parser.parse_args(argv)
+    store = ColumnarStore(args.store) if args.store else None
+
+    # Load market capitalization, Fear and Greed Index and S&P 500 data once
+    covariates = store.covariates(COVARIATE_COLUMNS) if store else CovariateStore.from_csv(COVARIATE_COLUMNS)
+
+    # Analyze each protocol type
+    protocol_types = [('TVL', 'TVL', 'DeFi'), ('Volume', 'Volume', 'DEX'), ('DAU', 'DAU', 'SocialFi')]
+
+    # Create 'panel' folder if it doesn't exist
+    panel_folder = 'panel'
+    if not os.path.exists(panel_folder):
+        os.makedirs(panel_folder)
+
+    for folder, metric, protocol_type in protocol_types:
+        print(f"\nPanel model for {protocol_type}:")
+        panel = load_panel(folder, metric, covariates, args.scale, store)
+        if panel.empty:
+            print(f"No panel results for {protocol_type}. Skipping...")
+            continue
+
+        results, fit_info = fit_panel(panel, metric, args.effects)
+        print(f"{fit_info['protocols']} protocols, {fit_info['nobs']} observations, within R-squared {fit_info['r2_within']:.4f}")
+        print(results[results['protocol'] == ''].to_string(index=False))
+        if args.effects == 'protocol':
+            specific = results[results['protocol'] != '']
+            print(f"Protocols with significant immediate effect: {((specific['term'] == 'X') & (specific['p_value'] < 0.05)).sum()}/{fit_info['protocols']}")
+            print(f"Protocols with significant slope change: {((specific['term'] == 'X_T') & (specific['p_value'] < 0.05)).sum()}/{fit_info['protocols']}")
+
+        results.to_csv(os.path.join(panel_folder, f'{protocol_type.lower()}_panel_results.csv'), index=False)
+
+    print(f"\nPanel results have been saved in the '{panel_folder}' folder.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from . import metrics
+
+# Covariate store of a worker process, handed over once by the pool initializer
+_worker_covariates = None
+
+
+def _init_worker(covariates, quiet):
+    global _worker_covariates
+    _worker_covariates = covariates
+    metrics.set_quiet(quiet)
+    # Forked workers inherit the parent's totals; start counting from zero
+    metrics.snapshot(reset=True)
+
+
+def _run_chunk(task):
+    # The chunk's timers and counters travel back with its result
+    func, file_paths, metric_name, options = task
+    result = func(file_paths, metric_name, _worker_covariates, **options)
+    return result, metrics.snapshot(reset=True)
+
+
+def split_chunks(items, n_chunks):
+    size = max(1, math.ceil(len(items) / n_chunks))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def concat_frames(frames):
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def map_protocol_chunks(func, file_paths, metric_name, covariates, workers=1, **options):
+    # func(file_paths, metric_name, covariates, **options) -> DataFrame with one row per protocol,
+    # or a tuple of such DataFrames (one per model) that are concatenated position by position
+    if workers <= 1 or len(file_paths) <= 1:
+        return func(file_paths, metric_name, covariates, **options)
+
+    # A few chunks per worker balance the load; chunks are returned in submission
+    # order, so the concatenated frame matches the serial run row for row
+    chunks = split_chunks(file_paths, workers * 4)
+    tasks = [(func, chunk, metric_name, options) for chunk in chunks]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(covariates, metrics.quiet())) as executor:
+        for result, worker_metrics in executor.map(_run_chunk, tasks):
+            metrics.merge(worker_metrics)
+            results.append(result)
+
+    if isinstance(results[0], tuple):
+        return tuple(concat_frames(frames) for frames in zip(*results))
+    return concat_frames(results)
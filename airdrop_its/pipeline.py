@@ -0,0 +1,138 @@
+import os
+import argparse
+from . import analysis
+from . import posterior
+from . import robustness
+from .batch_ols import COV_TYPES
+from .bootstrap import BOOTSTRAP_METHODS
+from .covariates import CovariateStore
+from .columnar import ColumnarStore, read_protocol
+from .history import add_history_arguments, history_from_args
+from .metrics import add_metrics_arguments, count, set_quiet, write_metrics
+from .parallel import map_protocol_chunks
+from .result_cache import add_cache_arguments, cache_from_args, result_spec, run_cached_models
+
+# Union of the covariates of the three scripts, loaded once
+COVARIATE_COLUMNS = ['MCt', 'Fear_Greed_Index', 'Close']
+
+def analyze_files(file_paths, metric_name, covariates, store=None, posterior_options=None, float32=False, **options):
+    # Read every protocol once and hand the same frame to the three model specifications,
+    # keeping only their compact series once the frame has been built
+    analysis_frames = analysis.new_frames(float32)
+    posterior_frames = posterior.new_frames(float32)
+    robustness_frames = robustness.new_frames(float32)
+    for file_path in file_paths:
+        protocol = os.path.basename(file_path).split('.')[0]
+        df = read_protocol(file_path, store)
+
+        # Main ITS fit with the Breusch-Pagan test and the GLS/OLS choice
+        built, airdrop_date = analysis.build_frame(df, covariates)
+        analysis_frames.append(protocol, built, metric_name, airdrop_date)
+
+        # Durbin-Watson on the model with the Fear and Greed Index
+        try:
+            posterior_frames.append(protocol, posterior.build_frame(df, covariates)[0], metric_name)
+        except Exception as e:
+            count('failures', model='posterior')
+            print(f"Error processing {protocol}: {str(e)}")
+
+        # Robustness check on the 15 days before the airdrop
+        built, airdrop_date = robustness.build_frame(df, covariates, file_path)
+        robustness_frames.append(protocol, built, metric_name, airdrop_date)
+
+    posterior_options = posterior_options or {}
+    return (analysis.fit_compact(analysis_frames, **options),
+            posterior.fit_compact(posterior_frames, metric_name, posterior_options.get('ar1', 'none'),
+                                  posterior_options.get('lags'), posterior_options.get('maxiter', 50)),
+            robustness.fit_compact(robustness_frames))
+
+def model_specs(metric_name, posterior_options, float32=False, **options):
+    # Same specs as the separate scripts, so the three share cache entries and history runs
+    return {
+        'analysis': result_spec(analysis.MODEL_SPEC, metric_name, dict(options, float32=float32)),
+        'posterior': result_spec(posterior.MODEL_SPEC, metric_name, posterior_options),
+        'robustness': result_spec(robustness.MODEL_SPEC, metric_name, {'float32': float32})
+    }
+
+def analyze_protocol_type(folder_path, metric_name, protocol_type, covariates, workers=1, cache=None, store=None,
+                          posterior_options=None, **options):
+    if store is not None:
+        file_paths = store.list_files(folder_path)
+    else:
+        file_paths = [os.path.join(folder_path, file) for file in os.listdir(folder_path) if file.endswith('.csv')]
+    posterior_options = posterior_options or {}
+    specs = model_specs(metric_name, posterior_options, **options)
+    return run_cached_models(cache, [(specs['analysis'], analysis.COVARIATE_COLUMNS),
+                                     (specs['posterior'], posterior.COVARIATE_COLUMNS),
+                                     (specs['robustness'], robustness.COVARIATE_COLUMNS)],
+                             covariates, file_paths,
+                             lambda paths: map_protocol_chunks(analyze_files, paths, metric_name, covariates, workers,
+                                                               store=store, posterior_options=posterior_options,
+                                                               **options),
+                             store)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Main ITS fit, autocorrelation check and robustness check in one pass over the data')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes (default: 1, run serially)')
+    parser.add_argument('--bootstrap', choices=['none'] + BOOTSTRAP_METHODS, default='none', help='add bootstrap confidence intervals for X, X*T, MCt and S&P 500 (default: none)')
+    parser.add_argument('--replicates', type=int, default=9999, help='number of bootstrap replicates per protocol (default: 9999)')
+    parser.add_argument('--block-length', type=int, default=None, help='block length in days (default: 1 for wild, nobs^(1/3) for block)')
+    parser.add_argument('--seed', type=int, default=0, help='bootstrap random seed (default: 0)')
+    parser.add_argument('--cov-type', choices=COV_TYPES, default='nonrobust', help='robust standard errors for protocols where Breusch-Pagan rejects, from the same OLS solve (default: nonrobust)')
+    parser.add_argument('--maxlags', type=int, default=None, help='Newey-West lags for --cov-type HAC (default: floor(4 (nobs/100)^(2/9)))')
+    parser.add_argument('--store', default=None, help='read protocols and covariates from a columnar store built by ingest.py instead of the CSVs')
+    parser.add_argument('--float32', action='store_true', help='keep the metric and covariate series in float32 until they are fitted, halving their memory (the fits are still in float64)')
+    posterior.add_ar1_arguments(parser)
+    add_cache_arguments(parser)
+    add_history_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+    set_quiet(args.quiet)
+    cache = cache_from_args(args)
+    history = history_from_args(args, 'pipeline')
+    store = ColumnarStore(args.store) if args.store else None
+
+    # Load market capitalization, Fear and Greed Index and S&P 500 data once
+    covariates = store.covariates(COVARIATE_COLUMNS) if store else CovariateStore.from_csv(COVARIATE_COLUMNS)
+
+    # Analyze each protocol type
+    protocol_types = [('TVL', 'TVL', 'DeFi'), ('Volume', 'Volume', 'DEX'), ('DAU', 'DAU', 'SocialFi')]
+
+    # Create the output folders if they don't exist
+    for output_folder in ['result', 'posterior_analysis', 'robustness']:
+        if not os.path.exists(output_folder):
+            os.makedirs(output_folder)
+
+    for folder, metric, protocol_type in protocol_types:
+        options = dict(bootstrap=args.bootstrap, replicates=args.replicates, block_length=args.block_length,
+                       seed=args.seed, cov_type=args.cov_type, maxlags=args.maxlags, float32=args.float32)
+        posterior_options = dict(float32=args.float32, ar1=args.ar1, lags=args.lags, maxiter=args.maxiter)
+        analysis_results, posterior_results, robustness_results = analyze_protocol_type(
+            folder, metric, protocol_type, covariates, args.workers, cache, store, posterior_options, **options)
+
+        print(f"\nAnalysis for {protocol_type}:")
+        if analysis_results.empty:
+            print(f"No results for {protocol_type}. Skipping...")
+        else:
+            analysis.report_results(analysis_results, protocol_type)
+
+        print(f"\nAutocorrelation analysis for {protocol_type}:")
+        posterior.report_results(posterior_results, protocol_type)
+
+        print(f"\nRobustness check for {protocol_type}:")
+        if robustness_results.empty:
+            print(f"No robustness check results for {protocol_type}. Skipping...")
+        else:
+            robustness.report_results(robustness_results, protocol_type)
+
+        if history is not None:
+            specs = model_specs(metric, posterior_options, **options)
+            history.append('analysis', protocol_type, specs['analysis'], analysis_results)
+            history.append('posterior', protocol_type, specs['posterior'], posterior_results)
+            history.append('robustness', protocol_type, specs['robustness'], robustness_results)
+
+    print("\nResults have been saved in the 'result', 'posterior_analysis' and 'robustness' folders.")
+    write_metrics(args, 'pipeline')
+
+if __name__ == '__main__':
+    main()
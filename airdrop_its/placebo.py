@@ -0,0 +1,122 @@
+import pandas as pd
+import numpy as np
+import os
+import argparse
+from .covariates import CovariateStore
+from .suffstats import break_sweep, standardize
+
+COVARIATE_COLUMNS = ['MCt', 'Fear_Greed_Index', 'Close']
+
+def prepare_data(file_path, metric_name, covariates):
+    df = pd.read_csv(file_path)
+    df['Date'] = pd.to_datetime(df['Date'], format='%d/%m/%Y')
+    df = df.sort_values('Date').reset_index(drop=True)
+
+    for column, values in covariates.window(df['Date'], COVARIATE_COLUMNS).items():
+        df[column] = values
+
+    return df
+
+def sweep_protocol(df, metric_name, min_segment):
+    # Base regressors: intercept, time trend and market covariates. Level (X) and slope (X*T)
+    # changes are added by break_sweep for every candidate intervention row.
+    n = len(df)
+    Z = standardize(np.column_stack([np.ones(n), np.arange(n), df[COVARIATE_COLUMNS].to_numpy(dtype=float)]))
+    y = df[metric_name].to_numpy(dtype=float)
+    y_scale = y.std() or 1.0
+    sweep = break_sweep(Z, y / y_scale, np.arange(min_segment, n - min_segment + 1))
+    return sweep, y_scale
+
+def empirical_p_value(observed, placebo):
+    # Share of placebo dates with an effect at least as extreme, counting the observed one
+    if len(placebo) == 0:
+        return np.nan
+    return (1 + np.sum(np.abs(placebo) >= np.abs(observed))) / (1 + len(placebo))
+
+def analyze_protocol_type(folder_path, metric_name, protocol_type, covariates, airdrop_dates, min_segment):
+    all_results = []
+    for file in os.listdir(folder_path):
+        if file.endswith('.csv'):
+            protocol = file.split('.')[0]
+            df = prepare_data(os.path.join(folder_path, file), metric_name, covariates)
+            airdrop_index = 30
+            airdrop_date = df['Date'].iloc[airdrop_index]
+
+            sweep, y_scale = sweep_protocol(df, metric_name, min_segment)
+            row_of_break = {b: k for k, b in enumerate(sweep.breaks)}
+            if airdrop_index not in row_of_break:
+                print(f"Skipping {protocol}: airdrop row {airdrop_index} leaves less than {min_segment} days on one side")
+                continue
+            observed = row_of_break[airdrop_index]
+            tvalues = sweep.tvalues[:, -2:]
+
+            # Every other admissible row of the protocol's own history is a placebo date
+            placebo_rows = [k for b, k in row_of_break.items() if b != airdrop_index]
+
+            # Fake airdrops: the airdrop dates of the other protocols that fall inside this history
+            date_rows = {date: row for row, date in enumerate(df['Date'])}
+            cross_rows = sorted({row_of_break[date_rows[date]] for other, date in airdrop_dates.items()
+                                 if other != (folder_path, protocol) and date in date_rows
+                                 and date_rows[date] in row_of_break and date_rows[date] != airdrop_index})
+
+            all_results.append({
+                'protocol': protocol,
+                'level change (X)': sweep.params[observed, -2] * y_scale,
+                'slope change (X*T)': sweep.params[observed, -1] * y_scale,
+                't (X)': tvalues[observed, 0],
+                't (X*T)': tvalues[observed, 1],
+                'placebo dates': len(placebo_rows),
+                'empirical p_value (X)': empirical_p_value(tvalues[observed, 0], tvalues[placebo_rows, 0]),
+                'empirical p_value (X*T)': empirical_p_value(tvalues[observed, 1], tvalues[placebo_rows, 1]),
+                'cross-protocol placebo dates': len(cross_rows),
+                'cross-protocol p_value (X)': empirical_p_value(tvalues[observed, 0], tvalues[cross_rows, 0]),
+                'cross-protocol p_value (X*T)': empirical_p_value(tvalues[observed, 1], tvalues[cross_rows, 1]),
+                'airdrop_date': airdrop_date
+            })
+
+    return pd.DataFrame(all_results)
+
+def collect_airdrop_dates(protocol_types):
+    airdrop_dates = {}
+    for folder, metric, protocol_type in protocol_types:
+        for file in os.listdir(folder):
+            if file.endswith('.csv'):
+                dates = pd.to_datetime(pd.read_csv(os.path.join(folder, file))['Date'], format='%d/%m/%Y').sort_values()
+                airdrop_dates[(folder, file.split('.')[0])] = dates.iloc[30]
+    return airdrop_dates
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Placebo (randomization inference) test of the airdrop effects')
+    parser.add_argument('--min-segment', type=int, default=7, help='minimum number of days before and after a placebo date (default: 7)')
+    args = parser.parse_args(argv)
+
+    # Load market capitalization, Fear and Greed Index and S&P 500 data once
+    covariates = CovariateStore.from_csv(COVARIATE_COLUMNS)
+
+    # Analyze each protocol type
+    protocol_types = [('TVL', 'TVL', 'DeFi'), ('Volume', 'Volume', 'DEX'), ('DAU', 'DAU', 'SocialFi')]
+    airdrop_dates = collect_airdrop_dates(protocol_types)
+
+    # Create 'placebo' folder if it doesn't exist
+    placebo_folder = 'placebo'
+    if not os.path.exists(placebo_folder):
+        os.makedirs(placebo_folder)
+
+    for folder, metric, protocol_type in protocol_types:
+        print(f"\nPlacebo test for {protocol_type}:")
+        results = analyze_protocol_type(folder, metric, protocol_type, covariates, airdrop_dates, args.min_segment)
+
+        if results.empty:
+            print(f"No placebo results for {protocol_type}. Skipping...")
+            continue
+
+        print(results)
+        print(f"Protocols with significant immediate effect (placebo): {(results['empirical p_value (X)'] < 0.05).sum()}/{len(results)}")
+        print(f"Protocols with significant slope change (placebo): {(results['empirical p_value (X*T)'] < 0.05).sum()}/{len(results)}")
+
+        results.to_csv(os.path.join(placebo_folder, f'{protocol_type.lower()}_placebo_results.csv'), index=False)
+
+    print(f"\nPlacebo test results have been saved in the '{placebo_folder}' folder.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+import pandas as pd
+import numpy as np
+import os
+import argparse
+from datetime import datetime, timedelta
+from .batch_ols import WindowProjections, breusch_godfrey_batch, fit_ar1_batch, fit_ols_stack, ljung_box_batch
+from .covariates import CovariateStore
+from .columnar import ColumnarStore, read_protocol
+from .compact import CompactFrames, records_frame, result_records
+from .parallel import map_protocol_chunks
+from .result_cache import add_cache_arguments, cache_from_args, result_spec, run_cached
+from .history import add_history_arguments, history_from_args
+from .metrics import add_metrics_arguments, count, quiet, set_quiet, timer, write_metrics
+
+# Identifies the model in the result cache; change it whenever the estimation changes
+MODEL_SPEC = 'posterior|OLS, Durbin-Watson|const,T,X,X_T,t,t_X,MCt,Fear_Greed_Index,Close|61 days'
+COVARIATE_COLUMNS = ['MCt', 'Fear_Greed_Index', 'Close']
+
+# Fields of the result records and their columns in the result files
+RESULT_COLUMNS = {
+    'dw': 'Durbin-Watson statistic',
+    'Close': 'S&P 500 coefficient',
+    'p_Close': 'S&P 500 p-value'
+}
+# Added with --ar1: serial correlation tests and the AR(1)-corrected estimates, which are the
+# OLS ones for protocols where neither test rejects
+AR1_METHODS = ['prais-winsten', 'cochrane-orcutt']
+AR1_COLUMNS = {
+    'lb': 'Ljung-Box p-value',
+    'bg': 'Breusch-Godfrey p-value',
+    'rho': 'AR(1) rho',
+    'iterations': 'AR(1) iterations',
+    'converged': 'AR(1) converged',
+    'ar_X': 'Corrected X coefficient',
+    'ar_p_X': 'Corrected X p-value',
+    'ar_X_T': 'Corrected X*T coefficient',
+    'ar_p_X_T': 'Corrected X*T p-value',
+    'ar_Close': 'Corrected S&P 500 coefficient',
+    'ar_p_Close': 'Corrected S&P 500 p-value'
+}
+
+def build_frame(df, covariates):
+    # ITS columns and covariates for one protocol frame as read from disk
+    df = df.sort_values('Date')
+
+    airdrop_date = df.iloc[30]['Date']
+
+    df['T'] = range(-30, 31)
+    df['X'] = np.where(df.index < 30, 0, 1)
+    df['X_T'] = df['X'] * df['T']
+    df['t'] = range(1, 62)
+    df['t_X'] = df['t'] * df['X']
+
+    # Align market cap, Fear and Greed Index and S&P 500 data from the shared covariate calendar
+    df = df.reset_index(drop=True)
+    for column, values in covariates.window(df['Date'], ['MCt', 'Fear_Greed_Index', 'Close']).items():
+        df[column] = values
+
+    return df, airdrop_date
+
+def prepare_data(file_path, metric_name, covariates, store=None):
+    try:
+        if not quiet():
+            print(f"Processing file: {file_path}")
+        df = read_protocol(file_path, store)
+        if not quiet():
+            print(f"Columns in df: {df.columns}")
+        df, airdrop_date = build_frame(df, covariates)
+
+        if not quiet():
+            print(f"Final columns in df: {df.columns}")
+            print(f"Date range: {df['Date'].min()} to {df['Date'].max()}")
+            print(f"Airdrop date: {airdrop_date}")
+            print(f"Market cap data available: {df['MCt'].notna().sum()} / {len(df)} days")
+            print(f"Fear and Greed Index data available: {df['Fear_Greed_Index'].notna().sum()} / {len(df)} days")
+            print(f"S&P 500 data available: {df['Close'].notna().sum()} / {len(df)} days")
+            print("First few rows of merged data:")
+            print(df.head())
+            print("\n")
+
+        return df
+    except Exception as e:
+        print(f"Error in prepare_data for {file_path}: {str(e)}")
+        raise
+
+def new_frames(float32=False):
+    # Compact store for the 61-day window with the airdrop at row 30
+    return CompactFrames(['T', 'X', 'X_T', 't', 't_X'], COVARIATE_COLUMNS, 61, 30, float32)
+
+def fit_model(X, y, exog_names, metric_name, projections=None):
+    try:
+        with timer('fit'):
+            results = fit_ols_stack(X, y, exog_names, projections)
+        count('protocols_fitted', len(y), model='posterior')
+        return results
+    except Exception as e:
+        print(f"Error in fit_model for {metric_name}: {str(e)}")
+        raise
+
+def check_autocorrelation(results):
+    with timer('diagnostics'):
+        # Same arithmetic as statsmodels' durbin_watson, without importing statsmodels
+        diff_resid = np.diff(results.resid, 1, axis=1)
+        return np.sum(diff_resid ** 2, axis=1) / np.sum(results.resid ** 2, axis=1)
+
+def correct_ar1(X, y, results, records, start, stop, method, lags=None, maxiter=50):
+    # Ljung-Box and Breusch-Godfrey for the whole chunk, then one batched iterated AR(1)
+    # fit over the protocols where either test rejects at 5%
+    with timer('diagnostics'):
+        _, lb_pvalues = ljung_box_batch(results.resid, lags)
+        _, bg_pvalues = breusch_godfrey_batch(results, lags)
+    flagged = (lb_pvalues < 0.05) | (bg_pvalues < 0.05)
+    count('ar1_corrections', int(flagged.sum()), model='posterior')
+
+    params, pvalues = results.params_array.copy(), results.pvalues_array.copy()
+    rho, iterations = np.full(len(y), np.nan), np.zeros(len(y))
+    converged = np.ones(len(y), dtype=bool)
+    if flagged.any():
+        with timer('fit'):
+            (params[flagged], pvalues[flagged], rho[flagged], iterations[flagged],
+             converged[flagged]) = fit_ar1_batch(X[flagged], y[flagged], results.exog_names, method, maxiter)
+    count('ar1_not_converged', int((~converged).sum()), model='posterior')
+
+    records['lb'][start:stop] = lb_pvalues
+    records['bg'][start:stop] = bg_pvalues
+    records['rho'][start:stop] = rho
+    records['iterations'][start:stop] = iterations
+    records['converged'][start:stop] = converged
+    for name in ['X', 'X_T', 'Close']:
+        k = results.exog_names.index(name)
+        records[f'ar_{name}'][start:stop] = params[:, k]
+        records[f'ar_p_{name}'][start:stop] = pvalues[:, k]
+
+def analyze_files(file_paths, metric_name, covariates, store=None, float32=False, ar1='none', lags=None, maxiter=50):
+    # Every protocol is reduced to its compact series as soon as it has been read
+    frames = new_frames(float32)
+    for file_path in file_paths:
+        try:
+            frames.append(os.path.basename(file_path).split('.')[0],
+                          prepare_data(file_path, metric_name, covariates, store), metric_name)
+        except Exception as e:
+            count('failures', model='posterior')
+            print(f"Error processing {os.path.basename(file_path)}: {str(e)}")
+
+    return fit_compact(frames, metric_name, ar1, lags, maxiter)
+
+def fit_frames(protocols, dfs, metric_name, float32=False, ar1='none', lags=None, maxiter=50):
+    frames = new_frames(float32)
+    for protocol, df in zip(protocols, dfs):
+        frames.append(protocol, df, metric_name)
+
+    return fit_compact(frames, metric_name, ar1, lags, maxiter)
+
+def fit_compact(frames, metric_name, ar1='none', lags=None, maxiter=50):
+    if not len(frames):
+        return pd.DataFrame()
+
+    columns = dict(RESULT_COLUMNS)
+    if ar1 != 'none':
+        columns.update(AR1_COLUMNS)
+    records = result_records(len(frames), columns)
+    close = frames.exog_names.index('Close')
+    projections = WindowProjections()
+    for start, stop, X, y in frames.chunks():
+        results = fit_model(X, y, frames.exog_names, metric_name, projections)
+        records['dw'][start:stop] = check_autocorrelation(results)
+        records['Close'][start:stop] = results.params_array[:, close]
+        records['p_Close'][start:stop] = results.pvalues_array[:, close]
+        if ar1 != 'none':
+            correct_ar1(X, y, results, records, start, stop, ar1, lags, maxiter)
+    count('window_projection_hits', projections.hits, model='posterior')
+
+    results = records_frame(frames.protocols, records, columns)
+    results.insert(2, 'Autocorrelation', ['Positive' if dw < 1.5 else ('Negative' if dw > 2.5 else 'No evidence')
+                                          for dw in records['dw']])
+    if ar1 != 'none':
+        results['AR(1) iterations'] = results['AR(1) iterations'].astype(int)
+        results['AR(1) converged'] = results['AR(1) converged'].astype(bool)
+    return results
+
+def analyze_protocol_type(folder_path, metric_name, protocol_type, covariates, workers=1, cache=None, store=None, **options):
+    if store is not None:
+        file_paths = store.list_files(folder_path)
+    else:
+        file_paths = [os.path.join(folder_path, file) for file in os.listdir(folder_path) if file.endswith('.csv')]
+    spec = result_spec(MODEL_SPEC, metric_name, options)
+    return run_cached(cache, spec, covariates, COVARIATE_COLUMNS, file_paths,
+                      lambda paths: map_protocol_chunks(analyze_files, paths, metric_name, covariates, workers,
+                                                        store=store, **options),
+                      store)
+
+def report_results(results, protocol_type, posterior_folder='posterior_analysis'):
+    if not quiet():
+        print(results)
+    if 'AR(1) rho' in results:
+        corrected = results['AR(1) rho'].notna()
+        print(f"\n{protocol_type} protocols with serial correlation (Ljung-Box or Breusch-Godfrey at 5%), AR(1)-corrected: {corrected.sum()}/{len(results)}")
+        print(f"Average AR(1) rho of the corrected protocols: {results.loc[corrected, 'AR(1) rho'].mean()}")
+        print(f"Corrections that did not converge: {(~results['AR(1) converged']).sum()}")
+
+    # Save results
+    with timer('write'):
+        results.to_csv(os.path.join(posterior_folder, f'{protocol_type.lower()}_autocorrelation_results.csv'), index=False)
+
+def add_ar1_arguments(parser):
+    parser.add_argument('--ar1', choices=['none'] + AR1_METHODS, default='none', help='add Ljung-Box and Breusch-Godfrey tests and refit the protocols where either rejects with iterated AR(1) errors (default: none)')
+    parser.add_argument('--lags', type=int, default=None, help='lags of the Ljung-Box and Breusch-Godfrey tests (default: min(10, nobs // 5))')
+    parser.add_argument('--maxiter', type=int, default=50, help='iterations of the AR(1) refit (default: 50)')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Durbin-Watson autocorrelation check of the ITS models')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes (default: 1, run serially)')
+    parser.add_argument('--store', default=None, help='read protocols and covariates from a columnar store built by ingest.py instead of the CSVs')
+    parser.add_argument('--float32', action='store_true', help='keep the metric and covariate series in float32 until they are fitted, halving their memory (the fits are still in float64)')
+    add_ar1_arguments(parser)
+    add_cache_arguments(parser)
+    add_history_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+    set_quiet(args.quiet)
+    cache = cache_from_args(args)
+    history = history_from_args(args, 'posterior')
+    store = ColumnarStore(args.store) if args.store else None
+
+    # Load market capitalization, Fear and Greed Index and S&P 500 data once
+    covariates = store.covariates(COVARIATE_COLUMNS) if store else CovariateStore.from_csv(COVARIATE_COLUMNS)
+    print("Market cap data loaded. Date range:", covariates.date_ranges['MCt'][0], "to", covariates.date_ranges['MCt'][1])
+    print("Fear and Greed Index data loaded. Date range:", covariates.date_ranges['Fear_Greed_Index'][0], "to", covariates.date_ranges['Fear_Greed_Index'][1])
+    print("S&P 500 data loaded. Date range:", covariates.date_ranges['Close'][0], "to", covariates.date_ranges['Close'][1])
+
+    # Analyze each protocol type
+    protocol_types = [('TVL', 'TVL', 'DeFi'), ('Volume', 'Volume', 'DEX'), ('DAU', 'DAU', 'SocialFi')]
+
+    # Create posterior_analysis folder if it doesn't exist
+    posterior_folder = 'posterior_analysis'
+    if not os.path.exists(posterior_folder):
+        os.makedirs(posterior_folder)
+
+    for folder, metric, protocol_type in protocol_types:
+        print(f"\nAutocorrelation analysis for {protocol_type}:")
+        options = dict(float32=args.float32, ar1=args.ar1, lags=args.lags, maxiter=args.maxiter)
+        results = analyze_protocol_type(folder, metric, protocol_type, covariates, args.workers, cache, store, **options)
+        report_results(results, protocol_type, posterior_folder)
+        if history is not None:
+            history.append('posterior', protocol_type, result_spec(MODEL_SPEC, metric, options), results)
+
+    print(f"\nAutocorrelation analysis results have been saved in the '{posterior_folder}' folder.")
+    write_metrics(args, 'posterior')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import pickle
+from datetime import datetime
+
+import pandas as pd
+
+from .metrics import count
+
+
+def csv_date_span(raw):
+    # First and last date of a protocol CSV without a full pandas parse
+    dates = [datetime.strptime(line.split(',')[0], '%d/%m/%Y')
+             for line in raw.decode('utf-8-sig').splitlines()[1:] if line.strip()]
+    return min(dates), max(dates)
+
+
+# On-disk cache of per-protocol result rows. Entries are keyed by a hash of the protocol
+# name and CSV, the covariate values its window reads and the model spec, so a changed input simply
+# misses; the least recently used entries are evicted once the folder exceeds max_bytes.
+class ResultCache:
+    def __init__(self, folder='.cache', max_bytes=256 * 2 ** 20):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def key(self, file_path, spec, covariates, covariate_columns, store=None):
+        if store is not None:
+            raw = store.raw(file_path)
+            first_date, last_date = store.date_span(file_path)
+        else:
+            with open(file_path, 'rb') as f:
+                raw = f.read()
+            try:
+                first_date, last_date = csv_date_span(raw)
+            except ValueError:
+                # Unreadable dates: never cached, the analysis reports the error itself
+                return None
+        digest = hashlib.sha256()
+        digest.update(spec.encode())
+        # The cached row carries the protocol label, so files with the same bytes under
+        # different names must not share an entry
+        digest.update(protocol_name(file_path).encode())
+        digest.update(hashlib.sha256(raw).digest())
+        digest.update(covariates.fingerprint(first_date, last_date, covariate_columns))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.folder, key[:2], f'{key}.pkl')
+
+    def get(self, key):
+        if key is None:
+            self.misses += 1
+            count('cache_lookups', result='uncacheable')
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                row = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            count('cache_lookups', result='miss')
+            return None
+        os.utime(path)
+        self.hits += 1
+        count('cache_lookups', result='hit')
+        return row
+
+    def put(self, key, row):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(row, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        entries = []
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                if name.endswith('.pkl'):
+                    stat = os.stat(os.path.join(root, name))
+                    entries.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+
+def result_spec(model_spec, metric_name, options):
+    # Model and settings behind a result set; keys the cache entries and the run history
+    return f"{model_spec}|{metric_name}|{sorted(options.items())}"
+
+
+def protocol_name(file_path):
+    return os.path.basename(file_path).split('.')[0]
+
+
+def run_cached(cache, spec, covariates, covariate_columns, file_paths, compute, store=None):
+    # compute(file_paths) -> DataFrame with one row per successfully analysed protocol;
+    # only the protocols without a cache entry are passed to it
+    return run_cached_models(cache, [(spec, covariate_columns)], covariates, file_paths,
+                             lambda paths: (compute(paths),), store)[0]
+
+
+def run_cached_models(cache, specs, covariates, file_paths, compute, store=None):
+    # Several models fitted in one pass over the files: specs is a list of (spec, covariate
+    # columns) and compute(file_paths) returns one DataFrame per spec. A protocol is passed
+    # to compute if any of the models misses it; cached rows of the other models are kept.
+    names = [protocol_name(file_path) for file_path in file_paths]
+    if cache is None or len(set(names)) != len(names):
+        # Rows are matched back to files by protocol label, which must be unique
+        return compute(file_paths)
+
+    keys = [[cache.key(file_path, spec, covariates, covariate_columns, store) for file_path in file_paths]
+            for spec, covariate_columns in specs]
+    rows = [[cache.get(key) for key in model_keys] for model_keys in keys]
+    missing = [i for i in range(len(file_paths)) if any(model_rows[i] is None for model_rows in rows)]
+
+    if missing:
+        computed = compute([file_paths[i] for i in missing])
+        for model_keys, model_rows, frame in zip(keys, rows, computed):
+            computed_rows = {} if frame.empty else {row['protocol']: row for row in frame.to_dict('records')}
+            for i in missing:
+                if model_rows[i] is None and names[i] in computed_rows:
+                    model_rows[i] = computed_rows[names[i]]
+                    if model_keys[i] is not None:
+                        cache.put(model_keys[i], model_rows[i])
+    cache.evict()
+
+    frames = []
+    for model_rows in rows:
+        model_rows = [row for row in model_rows if row is not None]
+        frames.append(pd.DataFrame(model_rows) if model_rows else pd.DataFrame())
+    return tuple(frames)
+
+
+def add_cache_arguments(parser):
+    parser.add_argument('--cache-dir', default='.cache', help="folder of the per-protocol result cache (default: .cache)")
+    parser.add_argument('--cache-size-mb', type=float, default=256, help='evict least recently used entries above this size (default: 256)')
+    parser.add_argument('--no-cache', action='store_true', help='recompute every protocol and leave the cache untouched')
+
+
+def cache_from_args(args):
+    if args.no_cache:
+        return None
+    return ResultCache(args.cache_dir, int(args.cache_size_mb * 2 ** 20))
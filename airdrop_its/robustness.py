@@ -0,0 +1,166 @@
+import pandas as pd
+import numpy as np
+import os
+import argparse
+from datetime import datetime, timedelta
+from .batch_ols import WindowProjections, fit_ols_stack
+from .covariates import CovariateStore
+from .columnar import ColumnarStore, read_protocol
+from .compact import CompactFrames, records_frame, result_records
+from .parallel import map_protocol_chunks
+from .result_cache import add_cache_arguments, cache_from_args, result_spec, run_cached
+from .history import add_history_arguments, history_from_args
+from .metrics import add_metrics_arguments, count, quiet, set_quiet, timer, write_metrics
+
+# Identifies the model in the result cache; change it whenever the estimation changes
+MODEL_SPEC = 'robustness|OLS|const,T,t,MCt|15 days before airdrop'
+COVARIATE_COLUMNS = ['MCt']
+
+# Fields of the result records and their columns in the result files
+RESULT_COLUMNS = {
+    'const': 'α0 (Intercept)',
+    'T': 'α1 (T)',
+    't': 'α2 (t)',
+    'MCt': 'δ (MCt)',
+    'p_T': 'p_value (T)',
+    'p_t': 'p_value (t)',
+    'p_MCt': 'p_value (MCt)'
+}
+
+def build_frame(df, covariates, file_path):
+    # Pre-airdrop subset, trend columns and covariates for one protocol frame as read from disk
+    df = df.sort_values('Date')
+
+    # Ensure we have exactly 61 rows
+    if len(df) != 61:
+        raise ValueError(f"Expected 61 rows, but got {len(df)} rows in {file_path}")
+
+    airdrop_date = df.iloc[30]['Date']  # 31st row (0-indexed) is the airdrop date
+
+    # For robustness check, use only 15 days before the airdrop
+    df = df.iloc[15:30]
+    df = df.reset_index(drop=True)
+    df['T'] = range(-15, 0)
+    df['t'] = range(1, len(df) + 1)
+
+    # Align market cap data from the shared covariate calendar
+    for column, values in covariates.window(df['Date'], ['MCt']).items():
+        df[column] = values
+
+    return df, airdrop_date
+
+def prepare_data(file_path, metric_name, covariates, store=None):
+    return build_frame(read_protocol(file_path, store), covariates, file_path)
+
+def new_frames(float32=False):
+    # Compact store for the 15 pre-airdrop days, T running from -15 to -1
+    return CompactFrames(['T', 't'], COVARIATE_COLUMNS, 15, 15, float32)
+
+def fit_model(X, y, exog_names, projections=None):
+    with timer('fit'):
+        results = fit_ols_stack(X, y, exog_names, projections)
+    count('protocols_fitted', len(y), model='robustness')
+    return results
+
+def analyze_files(file_paths, metric_name, covariates, store=None, float32=False):
+    # Every protocol is reduced to its compact series as soon as it has been read
+    frames = new_frames(float32)
+    for file_path in file_paths:
+        df, airdrop_date = prepare_data(file_path, metric_name, covariates, store)
+        frames.append(os.path.basename(file_path).split('.')[0], df, metric_name, airdrop_date)
+
+    return fit_compact(frames)
+
+def fit_frames(protocols, dfs, airdrop_dates, metric_name, float32=False):
+    frames = new_frames(float32)
+    for protocol, df, airdrop_date in zip(protocols, dfs, airdrop_dates):
+        frames.append(protocol, df, metric_name, airdrop_date)
+
+    return fit_compact(frames)
+
+def fit_compact(frames):
+    if not len(frames):
+        return pd.DataFrame()
+
+    records = result_records(len(frames), RESULT_COLUMNS)
+    projections = WindowProjections()
+    for start, stop, X, y in frames.chunks():
+        results = fit_model(X, y, frames.exog_names, projections)
+        for k, name in enumerate(frames.exog_names):
+            records[name][start:stop] = results.params_array[:, k]
+            if f'p_{name}' in RESULT_COLUMNS:
+                records[f'p_{name}'][start:stop] = results.pvalues_array[:, k]
+    count('window_projection_hits', projections.hits, model='robustness')
+
+    return records_frame(frames.protocols, records, RESULT_COLUMNS, frames.airdrop_dates())
+
+def analyze_protocol_type(folder_path, metric_name, protocol_type, covariates, workers=1, cache=None, store=None, **options):
+    if store is not None:
+        file_paths = store.list_files(folder_path)
+    else:
+        file_paths = [os.path.join(folder_path, file) for file in os.listdir(folder_path) if file.endswith('.csv')]
+    spec = result_spec(MODEL_SPEC, metric_name, options)
+    return run_cached(cache, spec, covariates, COVARIATE_COLUMNS, file_paths,
+                      lambda paths: map_protocol_chunks(analyze_files, paths, metric_name, covariates, workers,
+                                                        store=store, **options),
+                      store)
+
+def report_results(robustness_results, protocol_type):
+    if not quiet():
+        print(robustness_results)
+    print(f"\n{protocol_type} Robustness Check Average Effects:")
+    print(f"Average trend effect: {robustness_results['α1 (T)'].mean()}")
+    print(f"Average market cap effect: {robustness_results['δ (MCt)'].mean()}")
+    print(f"Protocols with significant trend effect: {(robustness_results['p_value (T)'] < 0.05).sum()}/{len(robustness_results)}")
+    print(f"Protocols with significant market cap effect: {(robustness_results['p_value (MCt)'] < 0.05).sum()}/{len(robustness_results)}")
+
+    # Save robustness check results in the 'robustness' folder
+    with timer('write'):
+        robustness_results.to_csv(os.path.join('robustness', f'{protocol_type.lower()}_robustness_check_results.csv'), index=False)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Robustness check on the 15 days before each airdrop')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes (default: 1, run serially)')
+    parser.add_argument('--store', default=None, help='read protocols and covariates from a columnar store built by ingest.py instead of the CSVs')
+    parser.add_argument('--float32', action='store_true', help='keep the metric and covariate series in float32 until they are fitted, halving their memory (the fits are still in float64)')
+    add_cache_arguments(parser)
+    add_history_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+    set_quiet(args.quiet)
+    cache = cache_from_args(args)
+    history = history_from_args(args, 'robustness')
+    store = ColumnarStore(args.store) if args.store else None
+
+    # Load market capitalization data once
+    covariates = store.covariates(COVARIATE_COLUMNS) if store else CovariateStore.from_csv(COVARIATE_COLUMNS)
+
+    # Analyze each protocol type
+    protocol_types = [('TVL', 'TVL', 'DeFi'), ('Volume', 'Volume', 'DEX'), ('DAU', 'DAU', 'SocialFi')]
+
+    # Perform robustness checks
+    print("\nPerforming robustness checks:")
+
+    # Create 'robustness' folder if it doesn't exist
+    if not os.path.exists('robustness'):
+        os.makedirs('robustness')
+
+    for folder, metric, protocol_type in protocol_types:
+        print(f"\nRobustness check for {protocol_type}:")
+        options = dict(float32=args.float32)
+        robustness_results = analyze_protocol_type(folder, metric, protocol_type, covariates, args.workers, cache, store,
+                                                   **options)
+
+        if robustness_results.empty:
+            print(f"No robustness check results for {protocol_type}. Skipping...")
+            continue
+
+        report_results(robustness_results, protocol_type)
+        if history is not None:
+            history.append('robustness', protocol_type, result_spec(MODEL_SPEC, metric, options), robustness_results)
+
+    print("\nRobustness check results have been saved in the 'robustness' folder.")
+    write_metrics(args, 'robustness')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+import pandas as pd
+import numpy as np
+import os
+import argparse
+from .covariates import CovariateStore
+from .columnar import ColumnarStore, read_protocol
+from .suffstats import window_sweep
+
+# Covariates of the main specification in analysis.py
+COVARIATE_COLUMNS = ['MCt', 'Close']
+
+def prepare_data(file_path, metric_name, covariates, store=None):
+    df = read_protocol(file_path, store)
+    df = df.sort_values('Date').reset_index(drop=True)
+
+    for column, values in covariates.window(df['Date'], COVARIATE_COLUMNS).items():
+        df[column] = values
+
+    return df
+
+def window_bounds(airdrop_index, nobs, min_days, max_days):
+    # Every (pre, post) pair from min_days to max_days, clipped to the rows on each side of the
+    # airdrop; a window covers rows airdrop - pre .. airdrop + post, airdrop day included
+    pre_days = np.arange(min_days, min(max_days, airdrop_index) + 1)
+    post_days = np.arange(min_days, min(max_days, nobs - 1 - airdrop_index) + 1)
+    pre, post = [a.ravel() for a in np.meshgrid(pre_days, post_days, indexing='ij')]
+    return pre, post, airdrop_index - pre, airdrop_index + post + 1
+
+def sweep_protocol(df, metric_name, airdrop_index, min_days, max_days):
+    # Identified form of the ITS model: intercept, pre-trend T, level change X, slope change X*T
+    # and the market covariates. T is centered on the airdrop row, so the design rows do not
+    # depend on the window and one set of prefix sums serves every window.
+    n = len(df)
+    T = np.arange(n, dtype=float) - airdrop_index
+    X = (T >= 0).astype(float)
+
+    # Standardize the covariates and the metric over the whole history to keep the prefix
+    # sums well conditioned; T, X and X*T enter unscaled, so only y_scale maps them back
+    C = df[COVARIATE_COLUMNS].to_numpy(dtype=float)
+    C_std = C.std(axis=0)
+    C_std[C_std == 0] = 1.0
+    y = df[metric_name].to_numpy(dtype=float)
+    y_scale = y.std() or 1.0
+
+    D = np.column_stack([np.ones(n), T, X, X * T, (C - C.mean(axis=0)) / C_std])
+    pre, post, starts, stops = window_bounds(airdrop_index, n, min_days, max_days)
+    sweep = window_sweep(D, (y - y.mean()) / y_scale, starts, stops)
+    return pre, post, sweep, y_scale, C_std
+
+def analyze_protocol_type(folder_path, metric_name, protocol_type, covariates, min_days, max_days, store=None):
+    from scipy import special
+    if store is not None:
+        file_paths = store.list_files(folder_path)
+    else:
+        file_paths = [os.path.join(folder_path, file) for file in os.listdir(folder_path) if file.endswith('.csv')]
+
+    frames = []
+    for file_path in file_paths:
+        protocol = os.path.basename(file_path).split('.')[0]
+        df = prepare_data(file_path, metric_name, covariates, store)
+        airdrop_index = 30
+        if len(df) <= airdrop_index + min_days or airdrop_index < min_days:
+            print(f"Skipping {protocol}: less than {min_days} days on one side of the airdrop")
+            continue
+
+        pre, post, sweep, y_scale, C_std = sweep_protocol(df, metric_name, airdrop_index, min_days, max_days)
+        pvalues = special.stdtr(sweep.df_resid[:, np.newaxis], -np.abs(sweep.tvalues)) * 2
+
+        frames.append(pd.DataFrame({
+            'protocol': protocol,
+            'pre_days': pre,
+            'post_days': post,
+            'nobs': sweep.stops - sweep.starts,
+            'α1 (T)': sweep.params[:, 1] * y_scale,
+            'α2 (X)': sweep.params[:, 2] * y_scale,
+            'α3 (X*T)': sweep.params[:, 3] * y_scale,
+            'δ (MCt)': sweep.params[:, 4] * y_scale / C_std[0],
+            'S&P 500': sweep.params[:, 5] * y_scale / C_std[1],
+            'p_value (X)': pvalues[:, 2],
+            'p_value (X*T)': pvalues[:, 3],
+            'airdrop_date': df['Date'].iloc[airdrop_index]
+        }))
+
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Refit the ITS model for every pre/post window length around the airdrop')
+    parser.add_argument('--min-days', type=int, default=7, help='shortest window on each side of the airdrop (default: 7)')
+    parser.add_argument('--max-days', type=int, default=90, help='longest window on each side, clipped to the available data (default: 90)')
+    parser.add_argument('--store', default=None, help='read protocols and covariates from a columnar store built by ingest.py instead of the CSVs')
+    args = parser.parse_args(argv)
+    store = ColumnarStore(args.store) if args.store else None
+
+    # Load market capitalization and S&P 500 data once
+    covariates = store.covariates(COVARIATE_COLUMNS) if store else CovariateStore.from_csv(COVARIATE_COLUMNS)
+
+    # Analyze each protocol type
+    protocol_types = [('TVL', 'TVL', 'DeFi'), ('Volume', 'Volume', 'DEX'), ('DAU', 'DAU', 'SocialFi')]
+
+    # Create 'sensitivity' folder if it doesn't exist
+    sensitivity_folder = 'sensitivity'
+    if not os.path.exists(sensitivity_folder):
+        os.makedirs(sensitivity_folder)
+
+    for folder, metric, protocol_type in protocol_types:
+        print(f"\nWindow sensitivity for {protocol_type}:")
+        results = analyze_protocol_type(folder, metric, protocol_type, covariates, args.min_days, args.max_days, store)
+
+        if results.empty:
+            print(f"No window sensitivity results for {protocol_type}. Skipping...")
+            continue
+
+        # Per protocol: range of the level and slope changes and how often they are significant
+        summary = results.groupby('protocol', sort=False).agg(
+            windows=('nobs', 'size'),
+            min_level_change=('α2 (X)', 'min'),
+            max_level_change=('α2 (X)', 'max'),
+            significant_level=('p_value (X)', lambda p: (p < 0.05).mean()),
+            min_slope_change=('α3 (X*T)', 'min'),
+            max_slope_change=('α3 (X*T)', 'max'),
+            significant_slope=('p_value (X*T)', lambda p: (p < 0.05).mean())
+        )
+        print(summary)
+
+        results.to_csv(os.path.join(sensitivity_folder, f'{protocol_type.lower()}_window_sweep.csv'), index=False)
+
+    print(f"\nWindow sensitivity results have been saved in the '{sensitivity_folder}' folder.")
+
+if __name__ == '__main__':
+    main()
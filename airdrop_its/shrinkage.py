@@ -0,0 +1,194 @@
+import pandas as pd
+import numpy as np
+import os
+import argparse
+from . import analysis
+from .batch_ols import COV_TYPES, fit_ols_batch
+from .covariates import CovariateStore
+from .columnar import ColumnarStore, read_protocol
+
+METHODS = ['em', 'gibbs']
+SCALES = ['level', 'relative']
+EM_MAX_ITER = 10000
+
+# Coefficients pooled across the protocols of a type
+EFFECTS = [('X', 'X'), ('X_T', 'X*T')]
+
+def protocol_estimates(file_paths, metric_name, covariates, scale, cov_type='nonrobust', maxlags=None, store=None):
+    # Per-protocol X and X*T estimates and their 2x2 covariances from one batched OLS solve.
+    # Identified form of the analysis.py design: t and t*X only duplicate T and X*T, and the
+    # covariates are standardized, which leaves the X and X*T coefficients unchanged.
+    protocols, dfs = [], []
+    for file_path in file_paths:
+        df, _ = analysis.build_frame(read_protocol(file_path, store), covariates)
+        for column in analysis.COVARIATE_COLUMNS:
+            df[column] = (df[column] - df[column].mean()) / (df[column].std() or 1.0)
+        if scale == 'relative':
+            # Effects as shares of the protocol's pre-airdrop mean, comparable across protocol sizes
+            df[metric_name] = df[metric_name] / df.loc[df['X'] == 0, metric_name].mean()
+        protocols.append(os.path.basename(file_path).split('.')[0])
+        dfs.append(df)
+
+    if not dfs:
+        return protocols, np.empty((0, 2)), np.empty((0, 2, 2))
+
+    results = fit_ols_batch(dfs, ['T', 'X', 'X_T'] + analysis.COVARIATE_COLUMNS, metric_name)
+    cov = results.cov_params() if cov_type == 'nonrobust' else results.robust_cov_params(cov_type, maxlags)
+    index = [results.exog_names.index(name) for name, _ in EFFECTS]
+    return protocols, results.params_array[:, index], cov[:, index][:, :, index]
+
+def posterior_moments(b, S, mu, Sigma):
+    # Normal-normal update of every protocol, written without inverting Sigma so that a
+    # between-protocol covariance shrinking towards zero stays well defined
+    gain = Sigma @ np.linalg.inv(Sigma + S)
+    mean = mu + (gain @ (b - mu)[:, :, np.newaxis])[:, :, 0]
+    var = Sigma - gain @ Sigma
+    return mean, (var + np.swapaxes(var, -1, -2)) / 2
+
+def fit_em(b, S, tol=1e-10, max_iter=None):
+    # Empirical Bayes: b_i ~ N(theta_i, S_i), theta_i ~ N(mu, Sigma), with mu and Sigma
+    # estimated by EM on the marginal likelihood. Every step is a batched 2x2 operation,
+    # so thousands of protocols take milliseconds.
+    max_iter = max_iter or EM_MAX_ITER
+    mu = b.mean(axis=0)
+    Sigma = np.cov(b, rowvar=False)
+    sampling_var = np.diagonal(S, axis1=1, axis2=2).mean(axis=0)
+    for iteration in range(max_iter):
+        mean, var = posterior_moments(b, S, mu, Sigma)
+        new_mu = mean.mean(axis=0)
+        deviation = mean - new_mu
+        new_Sigma = (deviation.T @ deviation + var.sum(axis=0)) / len(b)
+        scale = np.sqrt(np.diagonal(new_Sigma) + sampling_var)
+        converged = np.abs((new_mu - mu) / scale).max() < tol and np.abs(new_Sigma - Sigma).max() / scale.max() ** 2 < tol
+        mu, Sigma = new_mu, new_Sigma
+        if converged:
+            break
+
+    mean, var = posterior_moments(b, S, mu, Sigma)
+    # Standard error of the category mean given Sigma
+    mu_cov = np.linalg.inv(np.linalg.inv(Sigma + S).sum(axis=0))
+    return mu, mu_cov, Sigma, mean, var, iteration + 1
+
+def em_intervals(mu, mu_cov, mean, var, level):
+    from scipy import special
+    z = special.ndtri(0.5 + level / 2)
+    protocol_sd, mu_sd = np.sqrt(np.diagonal(var, axis1=1, axis2=2)), np.sqrt(np.diagonal(mu_cov))
+    return mean, protocol_sd, mean - z * protocol_sd, mean + z * protocol_sd, mu, mu_sd, mu - z * mu_sd, mu + z * mu_sd
+
+def fit_gibbs(b, S, draws, burn, seed, level):
+    # Full hierarchical posterior by Gibbs sampling: flat prior on mu and an inverse-Wishart
+    # prior on Sigma with 3 degrees of freedom, scaled by the typical sampling variance
+    from scipy import stats
+    rng = np.random.default_rng(seed)
+    n, d = b.shape
+    nu0, Psi0 = d + 1, np.diag(np.diagonal(S, axis1=1, axis2=2).mean(axis=0))
+    mu, Sigma = b.mean(axis=0), np.cov(b, rowvar=False) + Psi0
+    jitter = 1e-12 * np.diag(np.diagonal(Psi0))
+    theta_draws, mu_draws, Sigma_sum = np.empty((draws, n, d)), np.empty((draws, d)), np.zeros((d, d))
+    for step in range(burn + draws):
+        mean, var = posterior_moments(b, S, mu, Sigma)
+        theta = mean + (np.linalg.cholesky(var + jitter) @ rng.standard_normal((n, d, 1)))[:, :, 0]
+        mu = rng.multivariate_normal(theta.mean(axis=0), Sigma / n)
+        deviation = theta - mu
+        Sigma = stats.invwishart.rvs(df=nu0 + n, scale=Psi0 + deviation.T @ deviation, random_state=rng)
+        if step >= burn:
+            theta_draws[step - burn], mu_draws[step - burn] = theta, mu
+            Sigma_sum += Sigma
+
+    tails = [50 * (1 - level), 50 * (1 + level)]
+    theta_lower, theta_upper = np.percentile(theta_draws, tails, axis=0)
+    mu_lower, mu_upper = np.percentile(mu_draws, tails, axis=0)
+    return (theta_draws.mean(axis=0), theta_draws.std(axis=0), theta_lower, theta_upper,
+            mu_draws.mean(axis=0), mu_draws.std(axis=0), mu_lower, mu_upper, Sigma_sum / draws)
+
+def analyze_protocol_type(folder_path, metric_name, protocol_type, covariates, method, scale, level, draws, burn, seed,
+                          cov_type='nonrobust', maxlags=None, store=None):
+    if store is not None:
+        file_paths = store.list_files(folder_path)
+    else:
+        file_paths = [os.path.join(folder_path, file) for file in os.listdir(folder_path) if file.endswith('.csv')]
+
+    protocols, b, S = protocol_estimates(file_paths, metric_name, covariates, scale, cov_type, maxlags, store)
+    if len(protocols) < 2:
+        return pd.DataFrame(), None
+
+    if method == 'em':
+        mu, mu_cov, Sigma, mean, var, iterations = fit_em(b, S)
+        if iterations < EM_MAX_ITER:
+            print(f"EM converged after {iterations} iterations")
+        else:
+            print(f"EM stopped after {iterations} iterations without converging; a between-protocol variance is near zero")
+        mean, sd, lower, upper, mu, mu_sd, mu_lower, mu_upper = em_intervals(mu, mu_cov, mean, var, level)
+    else:
+        mean, sd, lower, upper, mu, mu_sd, mu_lower, mu_upper, Sigma = fit_gibbs(b, S, draws, burn, seed, level)
+
+    raw_sd = np.sqrt(np.diagonal(S, axis1=1, axis2=2))
+    results = pd.DataFrame({'protocol': protocols})
+    for k, (_, label) in enumerate(EFFECTS):
+        results[f'estimate ({label})'] = b[:, k]
+        results[f'std error ({label})'] = raw_sd[:, k]
+        results[f'posterior mean ({label})'] = mean[:, k]
+        results[f'posterior sd ({label})'] = sd[:, k]
+        results[f'lower ({label})'] = lower[:, k]
+        results[f'upper ({label})'] = upper[:, k]
+        # Share of the distance to the category mean removed by pooling; the joint X, X*T
+        # update can move an estimate past the mean (above 1) or away from it (below 0)
+        results[f'shrinkage ({label})'] = 1 - (mean[:, k] - mu[k]) / np.where(b[:, k] == mu[k], np.nan, b[:, k] - mu[k])
+
+    category = pd.DataFrame({
+        'effect': [label for _, label in EFFECTS],
+        'unweighted mean': b.mean(axis=0),
+        'pooled mean': mu,
+        'pooled sd': mu_sd,
+        'lower': mu_lower,
+        'upper': mu_upper,
+        'between-protocol sd': np.sqrt(np.diagonal(Sigma))
+    })
+    return results, category
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Partially pool the per-protocol airdrop effects towards the protocol type mean')
+    parser.add_argument('--method', choices=METHODS, default='em', help='empirical Bayes by EM, or the full posterior by Gibbs sampling (default: em)')
+    parser.add_argument('--scale', choices=SCALES, default='relative', help='pool the effects in levels, or relative to each protocol\'s pre-airdrop mean (default: relative)')
+    parser.add_argument('--level', type=float, default=0.95, help='coverage of the posterior intervals (default: 0.95)')
+    parser.add_argument('--draws', type=int, default=2000, help='Gibbs draws kept after burn-in (default: 2000)')
+    parser.add_argument('--burn', type=int, default=500, help='Gibbs burn-in draws (default: 500)')
+    parser.add_argument('--seed', type=int, default=0, help='Gibbs random seed (default: 0)')
+    parser.add_argument('--cov-type', choices=COV_TYPES, default='nonrobust', help='covariance of the per-protocol estimates (default: nonrobust)')
+    parser.add_argument('--maxlags', type=int, default=None, help='Newey-West lags for --cov-type HAC (default: floor(4 (nobs/100)^(2/9)))')
+    parser.add_argument('--store', default=None, help='read protocols and covariates from a columnar store built by ingest.py instead of the CSVs')
+    args = parser.parse_args(argv)
+    store = ColumnarStore(args.store) if args.store else None
+
+    # Load market capitalization and S&P 500 data once
+    covariates = store.covariates(analysis.COVARIATE_COLUMNS) if store else CovariateStore.from_csv(analysis.COVARIATE_COLUMNS)
+
+    # Analyze each protocol type
+    protocol_types = [('TVL', 'TVL', 'DeFi'), ('Volume', 'Volume', 'DEX'), ('DAU', 'DAU', 'SocialFi')]
+
+    # Create 'shrinkage' folder if it doesn't exist
+    shrinkage_folder = 'shrinkage'
+    if not os.path.exists(shrinkage_folder):
+        os.makedirs(shrinkage_folder)
+
+    for folder, metric, protocol_type in protocol_types:
+        print(f"\nShrinkage estimates for {protocol_type}:")
+        results, category = analyze_protocol_type(folder, metric, protocol_type, covariates, args.method, args.scale,
+                                                  args.level, args.draws, args.burn, args.seed, args.cov_type,
+                                                  args.maxlags, store)
+
+        if results.empty:
+            print(f"Not enough protocols to pool for {protocol_type}. Skipping...")
+            continue
+
+        print(results)
+        print(f"\n{protocol_type} pooled effects:")
+        print(category.to_string(index=False))
+
+        results.to_csv(os.path.join(shrinkage_folder, f'{protocol_type.lower()}_shrinkage_results.csv'), index=False)
+        category.to_csv(os.path.join(shrinkage_folder, f'{protocol_type.lower()}_pooled_effects.csv'), index=False)
+
+    print(f"\nShrinkage results have been saved in the '{shrinkage_folder}' folder.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+import pandas as pd
+import numpy as np
+import os
+import argparse
+import io
+import time
+from datetime import datetime
+from .covariates import CovariateStore
+
+# Covariates of the fit_model specification in posterior.py
+COVARIATE_COLUMNS = ['MCt', 'Fear_Greed_Index', 'Close']
+
+# Bytes before the consumed offset that must be unchanged for an append-only update
+TAIL_BYTES = 64
+
+def design_matrix(T, covariate_values, cov_mean, cov_std):
+    # Identified form of the fit_model design: t and t*X only duplicate T and X*T, so
+    # [const, T, X, X*T, covariates] spans the same columns with a full-rank X'X.
+    # Covariates are standardized with the scales fixed at initialization.
+    X = (T >= 0).astype(float)
+    return np.column_stack([np.ones(len(T)), T, X, X * T, (covariate_values - cov_mean) / cov_std])
+
+def covariate_values(covariates, first_date, dates):
+    # Align with the same [first date - 1, last date + 1] window the batch fit uses
+    window = covariates.window(pd.DatetimeIndex([first_date]).append(pd.DatetimeIndex(dates)), COVARIATE_COLUMNS)
+    return np.column_stack([window[column][1:] for column in COVARIATE_COLUMNS])
+
+def covariates_published_until(covariates):
+    # Last day every covariate has been published for. Later days would be filled with the
+    # last published values, so rows after it are left for a later run.
+    return min(covariates.date_ranges[column][1] for column in COVARIATE_COLUMNS)
+
+def published_offset(content, published_until):
+    # Byte offset just past the leading rows of a protocol CSV dated on or before published_until
+    lines = content.splitlines(keepends=True)
+    offset = position = len(lines[0]) if lines else 0
+    for line in lines[1:]:
+        position += len(line)
+        text = line.decode('utf-8').strip()
+        if not text:
+            continue
+        if datetime.strptime(text.split(',')[0], '%d/%m/%Y') > published_until:
+            break
+        offset = position
+    return offset
+
+def init_state(file_path, metric_name, covariates):
+    # Full fit on the rows already in the file whose covariates are published; returns None
+    # while X'X is still singular
+    with open(file_path, 'rb') as f:
+        content = f.read()
+    content = content[:published_offset(content, covariates_published_until(covariates))]
+    df = pd.read_csv(io.BytesIO(content))
+    df['Date'] = pd.to_datetime(df['Date'], format='%d/%m/%Y')
+    df = df.sort_values('Date').reset_index(drop=True)
+    airdrop_index = 30
+    if len(df) <= airdrop_index:
+        return None
+
+    first_date = df['Date'].iloc[0]
+    C = covariate_values(covariates, first_date, df['Date'])
+    if np.isnan(C).any():
+        return None
+    cov_mean = C.mean(axis=0)
+    cov_std = C.std(axis=0)
+    cov_std[cov_std == 0] = 1.0
+
+    T = np.arange(len(df), dtype=float) - airdrop_index
+    D = design_matrix(T, C, cov_mean, cov_std)
+    y = df[metric_name].to_numpy(dtype=float)
+    xtx = D.T @ D
+    if np.linalg.matrix_rank(xtx) < D.shape[1]:
+        return None
+
+    P = np.linalg.inv(xtx)
+    beta = P @ (D.T @ y)
+    resid = y - D @ beta
+    dD, dy = np.diff(D, axis=0), np.diff(y)
+
+    return {
+        'P': P,
+        'beta': beta,
+        'ssr': resid @ resid,
+        'nobs': len(y),
+        'diff_xx': dD.T @ dD,
+        'diff_xy': dD.T @ dy,
+        'diff_yy': dy @ dy,
+        'last_x': D[-1],
+        'last_y': y[-1],
+        'recursive_resid': np.nan,
+        'cov_mean': cov_mean,
+        'cov_std': cov_std,
+        'next_T': T[-1] + 1,
+        'first_date': np.datetime64(first_date, 'D'),
+        'last_date': np.datetime64(df['Date'].iloc[-1], 'D'),
+        'airdrop_date': np.datetime64(df['Date'].iloc[airdrop_index], 'D'),
+        'offset': len(content),
+        'tail': np.frombuffer(content[-TAIL_BYTES:], dtype=np.uint8)
+    }
+
+def read_tail(file_path, offset):
+    with open(file_path, 'rb') as f:
+        f.seek(max(offset - TAIL_BYTES, 0))
+        return np.frombuffer(f.read(offset - max(offset - TAIL_BYTES, 0)), dtype=np.uint8)
+
+def read_new_rows(file_path, state):
+    # Lines appended after the consumed offset, with the byte offset just past each one.
+    # Returns None if the consumed part of the file was rewritten rather than appended to.
+    offset = int(state['offset'])
+    tail = state['tail'].tobytes()
+    with open(file_path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() < offset:
+            return None
+        f.seek(offset - len(tail))
+        if f.read(len(tail)) != tail:
+            return None
+        new = f.read()
+
+    rows = []
+    position = offset
+    for line in new.splitlines(keepends=True):
+        position += len(line)
+        text = line.decode('utf-8').strip()
+        if text:
+            date, value = text.split(',')[:2]
+            rows.append((datetime.strptime(date, '%d/%m/%Y'), float(value), position))
+    return rows
+
+def update_state(state, x, y):
+    # Recursive least squares step; the recursive residual updates the SSR exactly
+    P, beta = state['P'], state['beta']
+    Px = P @ x
+    denominator = 1.0 + x @ Px
+    error = y - x @ beta
+    gain = Px / denominator
+    state['beta'] = beta + gain * error
+    P = P - np.outer(gain, Px)
+    state['P'] = (P + P.T) / 2
+    state['ssr'] = state['ssr'] + error * error / denominator
+    state['recursive_resid'] = error / np.sqrt(denominator)
+    state['nobs'] = state['nobs'] + 1
+
+    # Cross-products of the differenced rows keep the Durbin-Watson numerator exact
+    dx, dy = x - state['last_x'], y - state['last_y']
+    state['diff_xx'] = state['diff_xx'] + np.outer(dx, dx)
+    state['diff_xy'] = state['diff_xy'] + dx * dy
+    state['diff_yy'] = state['diff_yy'] + dy * dy
+    state['last_x'], state['last_y'] = x, y
+
+def consume(state, rows, covariates):
+    # Apply the new rows in order; stops at a row whose covariates are not published yet
+    # (missing, or dated after the end of the covariate calendar), which is picked up again
+    # on the next run
+    if not rows:
+        return 0
+    dates = [date for date, _, _ in rows]
+    if any(np.datetime64(date, 'D') <= state['last_date'] for date in dates) or any(np.diff(dates) <= pd.Timedelta(0)):
+        raise ValueError("appended rows are not in increasing date order")
+
+    C = covariate_values(covariates, pd.Timestamp(state['first_date']), dates)
+    published_until = covariates_published_until(covariates)
+    consumed = 0
+    for (date, value, position), covariate_row in zip(rows, C):
+        if date > published_until or np.isnan(covariate_row).any():
+            break
+        x = design_matrix(np.array([float(state['next_T'])]), covariate_row[np.newaxis, :],
+                          state['cov_mean'], state['cov_std'])[0]
+        update_state(state, x, value)
+        state['next_T'] = state['next_T'] + 1
+        state['last_date'] = np.datetime64(date, 'D')
+        state['offset'] = position
+        consumed += 1
+    return consumed
+
+def durbin_watson_stat(state):
+    # sum((e_t - e_{t-1})^2) / sum(e_t^2) for the current coefficients
+    beta = state['beta']
+    numerator = state['diff_yy'] - 2 * beta @ state['diff_xy'] + beta @ state['diff_xx'] @ beta
+    return numerator / state['ssr']
+
+def load_state(path):
+    with np.load(path, allow_pickle=False) as data:
+        # Scalars come back as 0-d arrays
+        return {key: data[key][()] for key in data.files}
+
+def save_state(path, state):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+    np.savez(tmp_path, **state)
+    os.replace(tmp_path, path)
+
+def process_file(file_path, metric_name, covariates, state_folder, reset=False):
+    protocol = os.path.basename(file_path).split('.')[0]
+    state_path = os.path.join(state_folder, os.path.basename(os.path.dirname(file_path)), f'{protocol}.npz')
+
+    state, consumed = None, 0
+    if not reset and os.path.exists(state_path):
+        state = load_state(state_path)
+        rows = read_new_rows(file_path, state)
+        if rows is None:
+            print(f"{file_path} was rewritten, refitting from scratch")
+            state = None
+        else:
+            consumed = consume(state, rows, covariates)
+            if consumed:
+                state['tail'] = read_tail(file_path, int(state['offset']))
+
+    if state is None:
+        state = init_state(file_path, metric_name, covariates)
+        if state is None:
+            print(f"Skipping {protocol}: not enough post-airdrop rows to identify the model yet")
+            return None
+        consumed = int(state['nobs'])
+
+    save_state(state_path, state)
+    return state, consumed
+
+def summarize(protocol, state, consumed, elapsed):
+    from scipy import special
+    nobs = int(state['nobs'])
+    df_resid = nobs - len(state['beta'])
+    scale = state['ssr'] / df_resid
+    bse = np.sqrt(np.diagonal(state['P']) * scale)
+    pvalues = special.stdtr(df_resid, -np.abs(state['beta'] / bse)) * 2
+    return {
+        'protocol': protocol,
+        'nobs': nobs,
+        'new rows': consumed,
+        'last date': pd.Timestamp(state['last_date']),
+        'α2 (X)': state['beta'][2],
+        'α3 (X*T)': state['beta'][3],
+        'p_value (X)': pvalues[2],
+        'p_value (X*T)': pvalues[3],
+        'residual std': np.sqrt(scale),
+        'last recursive residual': state['recursive_resid'] / np.sqrt(scale),
+        'durbin_watson': durbin_watson_stat(state),
+        'update ms': elapsed * 1000,
+        'airdrop_date': pd.Timestamp(state['airdrop_date'])
+    }
+
+def analyze_protocol_type(folder_path, metric_name, protocol_type, covariates, state_folder, reset=False):
+    all_results = []
+    for file in os.listdir(folder_path):
+        if file.endswith('.csv'):
+            file_path = os.path.join(folder_path, file)
+            try:
+                start = time.perf_counter()
+                updated = process_file(file_path, metric_name, covariates, state_folder, reset)
+                elapsed = time.perf_counter() - start
+            except Exception as e:
+                print(f"Error updating {file_path}: {str(e)}")
+                continue
+            if updated is not None:
+                all_results.append(summarize(file.split('.')[0], *updated, elapsed))
+
+    return pd.DataFrame(all_results)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Update the ITS fits with the rows appended since the last run')
+    parser.add_argument('--state-dir', default='.streaming', help='folder of the per-protocol recursive least squares state (default: .streaming)')
+    parser.add_argument('--reset', action='store_true', help='discard the saved state and refit every protocol from its full history')
+    args = parser.parse_args(argv)
+
+    # Load market capitalization, Fear and Greed Index and S&P 500 data once
+    covariates = CovariateStore.from_csv(COVARIATE_COLUMNS)
+
+    # Analyze each protocol type
+    protocol_types = [('TVL', 'TVL', 'DeFi'), ('Volume', 'Volume', 'DEX'), ('DAU', 'DAU', 'SocialFi')]
+
+    # Create 'streaming' folder if it doesn't exist
+    streaming_folder = 'streaming'
+    if not os.path.exists(streaming_folder):
+        os.makedirs(streaming_folder)
+
+    for folder, metric, protocol_type in protocol_types:
+        print(f"\nStreaming update for {protocol_type}:")
+        results = analyze_protocol_type(folder, metric, protocol_type, covariates, args.state_dir, args.reset)
+
+        if results.empty:
+            print(f"No streaming results for {protocol_type}. Skipping...")
+            continue
+
+        print(results)
+        print(f"Rows consumed: {results['new rows'].sum()}, mean update time: {results['update ms'].mean():.3f} ms per protocol")
+
+        results.to_csv(os.path.join(streaming_folder, f'{protocol_type.lower()}_streaming_results.csv'), index=False)
+
+    print(f"\nStreaming results have been saved in the '{streaming_folder}' folder.")
+
+if __name__ == '__main__':
+    main()
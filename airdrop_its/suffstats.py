@@ -0,0 +1,145 @@
+from collections import namedtuple
+
+import numpy as np
+
+BreakSweep = namedtuple('BreakSweep', ['breaks', 'params', 'bse', 'tvalues', 'ssr', 'df_resid'])
+WindowSweep = namedtuple('WindowSweep', ['starts', 'stops', 'params', 'bse', 'tvalues', 'ssr', 'df_resid'])
+ChowSweep = namedtuple('ChowSweep', ['breaks', 'fvalues', 'ssr', 'df_num', 'df_resid'])
+
+
+def prefix_sums(a):
+    # out[b] = a[:b].sum(axis=0), with out[0] = 0
+    out = np.zeros((len(a) + 1,) + a.shape[1:])
+    np.cumsum(a, axis=0, out=out[1:])
+    return out
+
+
+def suffix_sums(a):
+    # out[b] = a[b:].sum(axis=0), with out[len(a)] = 0
+    out = np.zeros((len(a) + 1,) + a.shape[1:])
+    out[:-1] = np.cumsum(a[::-1], axis=0)[::-1]
+    return out
+
+
+def standardize(Z):
+    # Center and scale every non-constant column; coefficients on the remaining
+    # (break) columns are unchanged because the intercept absorbs the shift
+    Z = np.asarray(Z, dtype=float)
+    std = Z.std(axis=0)
+    varying = std > 0
+    Z = Z.copy()
+    Z[:, varying] = (Z[:, varying] - Z[:, varying].mean(axis=0)) / std[varying]
+    return Z
+
+
+def break_sweep(Z, y, breaks):
+    # OLS of y on [Z, X_b, X_b * (i - b)] for every break row b, where X_b = 1 for rows i >= b.
+    # X'X and X'y of each break are assembled from suffix sums of the cross-products,
+    # so the whole sweep costs O(n p) to prepare and O(p^2) per break to assemble.
+    Z = np.asarray(Z, dtype=float)
+    y = np.asarray(y, dtype=float)
+    breaks = np.asarray(breaks)
+    n, p0 = Z.shape
+    p = p0 + 2
+    i = np.arange(n, dtype=float)
+    b = breaks.astype(float)
+
+    s_z = suffix_sums(Z)[breaks]
+    s_iz = suffix_sums(i[:, np.newaxis] * Z)[breaks]
+    s_1 = n - b
+    s_i = suffix_sums(i)[breaks]
+    s_ii = suffix_sums(i * i)[breaks]
+    s_y = suffix_sums(y)[breaks]
+    s_iy = suffix_sums(i * y)[breaks]
+
+    z_x = s_z
+    z_xt = s_iz - b[:, np.newaxis] * s_z
+
+    xtx = np.empty((len(breaks), p, p))
+    xtx[:, :p0, :p0] = Z.T @ Z
+    xtx[:, :p0, p0] = xtx[:, p0, :p0] = z_x
+    xtx[:, :p0, p0 + 1] = xtx[:, p0 + 1, :p0] = z_xt
+    xtx[:, p0, p0] = s_1
+    xtx[:, p0, p0 + 1] = xtx[:, p0 + 1, p0] = s_i - b * s_1
+    xtx[:, p0 + 1, p0 + 1] = s_ii - 2 * b * s_i + b * b * s_1
+
+    xty = np.empty((len(breaks), p))
+    xty[:, :p0] = Z.T @ y
+    xty[:, p0] = s_y
+    xty[:, p0 + 1] = s_iy - b * s_y
+
+    xtx_inv = np.linalg.pinv(xtx, hermitian=True)
+    params = (xtx_inv @ xty[:, :, np.newaxis])[:, :, 0]
+    ssr = np.maximum(y @ y - (params * xty).sum(axis=1), 0.0)
+    df_resid = n - np.linalg.matrix_rank(xtx, hermitian=True)
+    bse = np.sqrt(np.diagonal(xtx_inv, axis1=1, axis2=2) * (ssr / df_resid)[:, np.newaxis])
+    return BreakSweep(breaks, params, bse, params / bse, ssr, df_resid)
+
+
+def window_sweep(D, y, starts, stops):
+    # OLS of y on D restricted to rows starts[w]:stops[w] for every window w. X'X, X'y and y'y
+    # of a window are differences of prefix sums of the per-row cross-products, so the sweep
+    # costs O(n p^2) to prepare and O(p^2) per window to assemble.
+    D = np.asarray(D, dtype=float)
+    y = np.asarray(y, dtype=float)
+    starts = np.asarray(starts)
+    stops = np.asarray(stops)
+
+    s_xx = prefix_sums(D[:, :, np.newaxis] * D[:, np.newaxis, :])
+    s_xy = prefix_sums(D * y[:, np.newaxis])
+    s_yy = prefix_sums(y * y)
+
+    xtx = s_xx[stops] - s_xx[starts]
+    xty = s_xy[stops] - s_xy[starts]
+    yty = s_yy[stops] - s_yy[starts]
+
+    xtx_inv = np.linalg.pinv(xtx, hermitian=True)
+    params = (xtx_inv @ xty[:, :, np.newaxis])[:, :, 0]
+    ssr = np.maximum(yty - (params * xty).sum(axis=1), 0.0)
+    df_resid = (stops - starts) - np.linalg.matrix_rank(xtx, hermitian=True)
+    bse = np.sqrt(np.diagonal(xtx_inv, axis1=1, axis2=2) * (ssr / df_resid)[:, np.newaxis])
+    return WindowSweep(starts, stops, params, bse, params / bse, ssr, df_resid)
+
+
+def chow_sweep(Z, Y, breaks):
+    # Chow F statistics of a level and slope change (X_b, X_b * (i - b)) at every break row b,
+    # for every series in Y (series, rows) at once. The series are partialled against Z once;
+    # the partialled break columns and their cross-products with the residuals come from suffix
+    # sums (Frisch-Waugh-Lovell), so each break adds a 2x2 solve per series to an O(n p^2) setup.
+    Z = np.asarray(Z, dtype=float)
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    breaks = np.asarray(breaks)
+    n = len(Z)
+    # Rows in units of the series length; F statistics do not depend on the column scale
+    i = np.arange(n, dtype=float) / n
+    b = breaks / n
+
+    ztz = Z.T @ Z
+    ztz_inv = np.linalg.pinv(ztz, hermitian=True)
+    resid = Y - (Y @ Z) @ ztz_inv @ Z.T
+    ssr_restricted = (resid * resid).sum(axis=1)
+
+    s_1 = (n - breaks).astype(float)
+    s_i = suffix_sums(i)[breaks]
+    s_ii = suffix_sums(i * i)[breaks]
+    s_z = suffix_sums(Z)[breaks]
+    btb = np.empty((len(breaks), 2, 2))
+    btb[:, 0, 0] = s_1
+    btb[:, 0, 1] = btb[:, 1, 0] = s_i - b * s_1
+    btb[:, 1, 1] = s_ii - 2 * b * s_i + b * b * s_1
+    btz = np.stack([s_z, suffix_sums(i[:, np.newaxis] * Z)[breaks] - b[:, np.newaxis] * s_z], axis=1)
+    wtw = btb - btz @ ztz_inv @ np.swapaxes(btz, -1, -2)
+
+    s_r = suffix_sums(resid.T)[breaks]
+    wtr = np.stack([s_r, suffix_sums(i[:, np.newaxis] * resid.T)[breaks] - b[:, np.newaxis] * s_r], axis=-1)
+    reduction = np.einsum('bsk,bkl,bsl->sb', wtr, np.linalg.pinv(wtw, hermitian=True), wtr)
+
+    df_num = np.linalg.matrix_rank(wtw, hermitian=True)
+    df_resid = n - np.linalg.matrix_rank(ztz, hermitian=True) - df_num
+    ssr = np.maximum(ssr_restricted[:, np.newaxis] - reduction, 0.0)
+    # A series the base regressors already fit exactly (e.g. a constant metric) leaves only
+    # rounding noise to explain, so its F statistics are undefined rather than infinite
+    exact = (ssr_restricted <= 1e-12 * (Y * Y).sum(axis=1))[:, np.newaxis] | (ssr == 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fvalues = np.where(exact, np.nan, (reduction / df_num) / (ssr / df_resid))
+    return ChowSweep(breaks, fvalues, ssr, df_num, df_resid)
@@ -0,0 +1,5 @@
+# Runs the benchmark command of the airdrop_its package (same as python -m airdrop_its benchmark)
+from airdrop_its.benchmark import *
+
+if __name__ == '__main__':
+    main()
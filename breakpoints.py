@@ -0,0 +1,5 @@
+# Runs the breakpoints command of the airdrop_its package (same as python -m airdrop_its breakpoints)
+from airdrop_its.breakpoints import *
+
+if __name__ == '__main__':
+    main()
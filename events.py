@@ -0,0 +1,5 @@
+# Runs the events command of the airdrop_its package (same as python -m airdrop_its events)
+from airdrop_its.events import *
+
+if __name__ == '__main__':
+    main()
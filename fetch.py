@@ -0,0 +1,5 @@
+# Runs the fetch command of the airdrop_its package (same as python -m airdrop_its fetch)
+from airdrop_its.fetch import *
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+# Runs the history command of the airdrop_its package (same as python -m airdrop_its history)
+from airdrop_its.history import *
+
+if __name__ == '__main__':
+    main()
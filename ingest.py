@@ -0,0 +1,5 @@
+# Runs the ingest command of the airdrop_its package (same as python -m airdrop_its ingest)
+from airdrop_its.ingest import *
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+# Runs the panel command of the airdrop_its package (same as python -m airdrop_its panel)
+from airdrop_its.panel import *
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+# Runs the pipeline command of the airdrop_its package (same as python -m airdrop_its pipeline)
+from airdrop_its.pipeline import *
+
+if __name__ == '__main__':
+    main()
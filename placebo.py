@@ -0,0 +1,5 @@
+# Runs the placebo command of the airdrop_its package (same as python -m airdrop_its placebo)
+from airdrop_its.placebo import *
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+# Runs the sensitivity command of the airdrop_its package (same as python -m airdrop_its sensitivity)
+from airdrop_its.sensitivity import *
+
+if __name__ == '__main__':
+    main()
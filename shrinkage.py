@@ -0,0 +1,5 @@
+# Runs the shrinkage command of the airdrop_its package (same as python -m airdrop_its shrinkage)
+from airdrop_its.shrinkage import *
+
+if __name__ == '__main__':
+    main()
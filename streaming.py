@@ -0,0 +1,5 @@
+# Runs the streaming command of the airdrop_its package (same as python -m airdrop_its streaming)
+from airdrop_its.streaming import *
+
+if __name__ == '__main__':
+    main()